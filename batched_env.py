@@ -0,0 +1,107 @@
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+from batched_game import *
+
+
+class BatchedTankVecEnv(VecEnv):
+    """
+    Vector env running every match in one `BatchedGame`. Each match steps like `TankEnv.step`:
+    other seats act until it is the reinforcement learning player's turn, then the agent acts.
+
+    Other seats are played by `opponent_policy(game, mask) -> actions`, by default
+    `BatchedGame.greedy_actions`. Finished matches are reset automatically, their last
+    observation is stored in `info["terminal_observation"]`.
+    """
+
+    def __init__(self, num_envs: int, opponent_policy=None):
+        self.game = BatchedGame(num_envs)
+        if opponent_policy is None:
+            opponent_policy = BatchedGame.greedy_actions
+        self.opponent_policy = opponent_policy
+        self.render_mode = None
+        observation_space = spaces.Box(low=-500, high=500, shape=(119,), dtype=np.int32)
+        super().__init__(num_envs, observation_space, spaces.Discrete(37))
+        self.actions = np.zeros(num_envs, dtype=int)
+
+    def reset(self) -> np.ndarray:
+        self.game.reset()
+        return self.game.observations()
+
+    def step_async(self, actions: np.ndarray):
+        self.actions = np.asarray(actions).reshape(self.num_envs)
+
+    def step_wait(self):
+        game = self.game
+        rewards = np.zeros(self.num_envs)
+
+        # While non reinforcement learning player, make actions with other players
+        while True:
+            waiting = ~game.done & (game.current_index != game.rl_player_index)
+            if not waiting.any():
+                break
+            rewards += game.make_game_action(self.opponent_policy(game, waiting), waiting)
+
+        acting = ~game.done & (game.current_index == game.rl_player_index)
+        rewards += game.make_game_action(self.actions, acting)
+
+        dones = game.done.copy()
+        observations = game.observations()
+        infos = [{} for _ in range(self.num_envs)]
+        for index in np.nonzero(dones)[0]:
+            infos[index]["terminal_observation"] = observations[index].copy()
+            infos[index]["TimeLimit.truncated"] = False
+        if dones.any():
+            game.reset(dones)
+            observations[dones] = game.observations()[dones]
+        return observations, rewards.astype(np.float32), dones, infos
+
+    def action_masks(self) -> np.ndarray:
+        """
+        Valid actions of the reinforcement learning player's tank in every match. Like
+        `TankEnv.action_masks`, all actions are allowed in matches where it is not that
+        player's turn, as the tank that acts next there is an opponent's.
+        """
+        game = self.game
+        rl_turn = ~game.done & (game.current_index == game.rl_player_index)
+        masks = np.ones((self.num_envs, self.action_space.n), dtype=bool)
+        masks[rl_turn] = game.action_masks(rl_turn)
+        return masks
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        if method_name == "action_masks":
+            # Masks of all matches come from one call, hand out one row per match
+            masks = self.action_masks()
+            return [masks[index] for index in self._get_indices(indices)]
+        method = getattr(self, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+
+if __name__ == "__main__":
+    # Check that masks after `step_wait` belong to the reinforcement learning player's tank
+    env = BatchedTankVecEnv(8)
+    env.reset()
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        masks = env.action_masks()
+        game = env.game
+        rl_turn = ~game.done & (game.current_index == game.rl_player_index)
+        acting_owner = game.owner[game.acting_vehicles()]
+        assert (acting_owner[rl_turn] == game.rl_player_index).all()
+        assert masks[~rl_turn].all()
+        assert (masks[rl_turn] == game.action_masks(rl_turn)).all()
+        actions = np.array([rng.choice(np.flatnonzero(mask)) for mask in masks])
+        env.step(actions)
+    print("Action masks match the reinforcement learning player's tanks")
@@ -0,0 +1,662 @@
+import numpy as np
+from game import *
+from player import *
+
+ACTION_DQ = np.array([direction[0] for direction in ACTION_DIRECTIONS])
+ACTION_DR = np.array([direction[1] for direction in ACTION_DIRECTIONS])
+ACTION_DISTANCE = np.array(ACTION_SPEED_POINTS)
+
+# Large enough to sort any hp or distance value behind it
+NOT_PREFERRED = 1000
+
+
+def hex_distance_to_center(q: np.ndarray, r: np.ndarray) -> np.ndarray:
+    return (np.abs(q) + np.abs(r) + np.abs(q + r)) // 2
+
+
+class BatchedGame:
+    """
+    State of N independent matches held in NumPy arrays and stepped together.
+
+    Every seat acts through the 37 action space of `ReinforcementLearningPlayer` and the rules
+    (movement, collision, shooting, neutrality, respawn, capture scoring, win checks and rewards)
+    are the ones of `Game`. Matches keep their own turn order, so finished matches can be reset
+    while the others keep playing. Vehicle order, spawns and stats are taken from a template
+    `Game`, the same one `TankEnv` would build.
+    """
+
+    def __init__(self, num_games: int, rl_player_index: int = 0, template: Game = None):
+        if template is None:
+            template = Game(False, rl_player_index)
+            template.players = [
+                Player("Player1", RED, 0),
+                Player("Player2", GREEN, 1),
+                Player("Player3", BLUE, 2),
+            ]
+            template.place_vehicles(template.players)
+
+        self.num_games = num_games
+        self.rl_player_index = rl_player_index
+        self.max_turns = template.max_turns
+        self.map_radius = template.map_radius
+        self.num_players = len(template.players)
+        self.num_vehicles = len(template.vehicles)
+
+        # Static per vehicle data, in `template.vehicles` order
+        vehicles = template.vehicles
+        self.owner = np.array([v.owning_player.index for v in vehicles])
+        self.type = np.array([VEHICLE_TYPE_IDS[v.type] for v in vehicles])
+        self.vehicle_index = np.array([v.vehicleIndex for v in vehicles])
+        self.spawn_q = np.array([v.spawn_position[0] for v in vehicles], dtype=np.int16)
+        self.spawn_r = np.array([v.spawn_position[1] for v in vehicles], dtype=np.int16)
+        self.spawn_hp = TYPE_HP[self.type]
+        self.sp = TYPE_SP[self.type]
+        self.damage = TYPE_DAMAGE[self.type]
+        self.destruction_points = TYPE_DESTRUCTION_POINTS[self.type]
+        self.owner_one_hot = np.eye(self.num_players, dtype=np.int16)[self.owner]
+
+        self.squad_size = np.array([len(player.vehicles) for player in template.players])
+        self.seat_vehicles = np.zeros((self.num_players, self.squad_size.max()), dtype=int)
+        for vehicle_id, vehicle in enumerate(vehicles):
+            self.seat_vehicles[vehicle.owning_player.index, vehicle.vehicleIndex] = (
+                vehicle_id
+            )
+
+        self.build_tile_grids(template)
+        self.build_fire_tables(template)
+
+        n, v, p = num_games, self.num_vehicles, self.num_players
+        self.q = np.zeros((n, v), dtype=np.int16)
+        self.r = np.zeros((n, v), dtype=np.int16)
+        self.hp = np.zeros((n, v), dtype=np.int16)
+        self.capture_points = np.zeros((n, v), dtype=np.int16)
+        self.range_bonus = np.zeros((n, v), dtype=bool)
+        self.kill_points = np.zeros((n, p), dtype=np.int32)
+        self.player_capture_points = np.zeros((n, p), dtype=np.int32)
+        self.neutrality_matrix = np.zeros((n, p, p), dtype=np.int8)
+        self.num_turns = np.zeros(n, dtype=np.int32)
+        self.current_index = np.zeros(n, dtype=np.int32)
+        self.current_tank_index = np.zeros(n, dtype=np.int32)
+        self.done = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def build_tile_grids(self, template: Game):
+        """Dense boolean grids indexed by [q + map_radius, r + map_radius], from the board's tile flags."""
+        size = 2 * self.map_radius + 1
+        board = template.board
+        self.obstacle_grid = (board.flag_grid & OBSTACLE) != 0
+        self.capture_grid = (board.flag_grid & CAPTURE_AREA) != 0
+        self.light_repair_grid = (board.flag_grid & LIGHT_REPAIR) != 0
+        self.heavy_repair_grid = (board.flag_grid & HEAVY_REPAIR) != 0
+        self.catapult_grid = (board.flag_grid & CATAPULT) != 0
+
+        capture_ids = [board.tile_ids[tile] for tile in board.capture_goals]
+        capture_distance = board.distances[:, capture_ids].min(axis=1)
+        self.capture_distance_grid = np.full((size, size), NOT_PREFERRED, dtype=np.int16)
+        for tile_id, (q, r) in enumerate(board.tiles):
+            self.capture_distance_grid[q + self.map_radius, r + self.map_radius] = (
+                capture_distance[tile_id]
+            )
+
+    def build_fire_tables(self, template: Game):
+        """
+        Offsets of shootable hexes around (0, 0) for every (type, range bonus), taken from
+        `get_shootable_hexes` of the vehicle classes so both engines share one definition.
+        """
+        board = template.board
+        player = template.players[0]
+        fire_offsets = {}
+        td_offsets = {}
+        for type_id, v_type in enumerate(VEHICLE_TYPES):
+            for bonus in (False, True):
+                vehicle = VEHICLE_CLASSES[v_type](player, (0, 0), 0)
+                vehicle.board = board
+                vehicle.shooting_range_bonus = bonus
+                if v_type == TANK_DESTROYER:
+                    td_offsets[bonus] = vehicle.get_shootable_hexes()
+                else:
+                    fire_offsets[type_id, bonus] = vehicle.get_shootable_hexes()[0]
+
+        max_hexes = max(len(hexes) for hexes in fire_offsets.values())
+        self.fire_offsets = np.zeros((len(VEHICLE_TYPES), 2, max_hexes, 2), dtype=np.int16)
+        self.fire_valid = np.zeros((len(VEHICLE_TYPES), 2, max_hexes), dtype=bool)
+        for (type_id, bonus), hexes in fire_offsets.items():
+            self.fire_offsets[type_id, int(bonus), : len(hexes)] = hexes
+            self.fire_valid[type_id, int(bonus), : len(hexes)] = True
+
+        max_length = max(len(direction) for direction in td_offsets[True])
+        self.td_offsets = np.zeros((2, 6, max_length, 2), dtype=np.int16)
+        self.td_valid = np.zeros((2, 6, max_length), dtype=bool)
+        for bonus, directions in td_offsets.items():
+            for index, hexes in enumerate(directions):
+                self.td_offsets[int(bonus), index, : len(hexes)] = hexes
+                self.td_valid[int(bonus), index, : len(hexes)] = True
+
+    def reset(self, mask: np.ndarray = None):
+        """Reset the masked matches (all when mask is None) to the opening position."""
+        if mask is None:
+            mask = np.ones(self.num_games, dtype=bool)
+        self.q[mask] = self.spawn_q
+        self.r[mask] = self.spawn_r
+        self.hp[mask] = self.spawn_hp
+        self.capture_points[mask] = 0
+        self.range_bonus[mask] = False
+        self.kill_points[mask] = 0
+        self.player_capture_points[mask] = 0
+        self.neutrality_matrix[mask] = 0
+        self.num_turns[mask] = 0
+        self.current_index[mask] = 0
+        self.current_tank_index[mask] = 0
+        self.done[mask] = False
+
+    def lookup(self, grid: np.ndarray, q: np.ndarray, r: np.ndarray, default=False):
+        """Read tile grid at (q, r), coordinates outside the grid read as `default`."""
+        radius = self.map_radius
+        inside = (np.abs(q) <= radius) & (np.abs(r) <= radius)
+        values = grid[
+            np.clip(q + radius, 0, 2 * radius), np.clip(r + radius, 0, 2 * radius)
+        ]
+        return np.where(inside, values, default)
+
+    def on_board(self, q: np.ndarray, r: np.ndarray) -> np.ndarray:
+        """Same bounds check as `Game.is_move_out_of_bounds`, True for tiles on the map."""
+        return (
+            np.maximum(np.maximum(np.abs(q), np.abs(r)), np.abs(q + r))
+            <= self.map_radius
+        )
+
+    def acting_vehicles(self) -> np.ndarray:
+        """Vehicle id of the current tank in every match."""
+        return self.seat_vehicles[self.current_index, self.current_tank_index]
+
+    def make_game_action(self, actions: np.ndarray, active: np.ndarray = None) -> np.ndarray:
+        """
+        Make a game action in every active match, like `Game.make_game_action`.
+        Return reward gained by the reinforcement learning player in each match.
+        """
+        if active is None:
+            active = ~self.done
+        actions = np.asarray(actions)
+        rewards = np.zeros(self.num_games)
+
+        # Game ended by maximum turns
+        max_turns_reached = active & (self.num_turns >= self.max_turns)
+        if max_turns_reached.any():
+            games = np.nonzero(max_turns_reached)[0]
+            rewards[games] += self.determine_winner_max_turns(games)
+            self.done[games] = True
+        games = np.nonzero(active & ~max_turns_reached)[0]
+        if len(games) == 0:
+            return rewards
+
+        # If first tank action of player, reset their row in neutrality matrix
+        first_tank = games[self.current_tank_index[games] == 0]
+        self.neutrality_matrix[first_tank, self.current_index[first_tank]] = 0
+
+        shooting = actions[games] == SHOOT_ACTION
+        if (~shooting).any():
+            moving_games = games[~shooting]
+            rewards[moving_games] += self.move(moving_games, actions[moving_games])
+        if shooting.any():
+            shooting_games = games[shooting]
+            rewards[shooting_games] += self.shoot(shooting_games)
+
+        rewards[games] += self.end_tank_action(games)
+        return rewards
+
+    def move(self, games: np.ndarray, actions: np.ndarray) -> np.ndarray:
+        """Move actions of `ReinforcementLearningPlayer` with `Game.move_vehicle` rules."""
+        vehicles = self.acting_vehicles()[games]
+        old_q = self.q[games, vehicles]
+        old_r = self.r[games, vehicles]
+        new_q = old_q + ACTION_DQ[actions]
+        new_r = old_r + ACTION_DR[actions]
+
+        illegal = ACTION_DISTANCE[actions] > self.sp[vehicles]
+        occupied = (
+            (self.q[games] == new_q[:, None]) & (self.r[games] == new_r[:, None])
+        ).any(axis=1)
+        in_bounds = self.on_board(new_q, new_r)
+        moved = (
+            ~illegal
+            & ~occupied
+            & ~self.lookup(self.obstacle_grid, new_q, new_r)
+            & in_bounds
+        )
+
+        moved_games = games[moved]
+        moved_vehicles = vehicles[moved]
+        q = new_q[moved]
+        r = new_r[moved]
+        self.q[moved_games, moved_vehicles] = q
+        self.r[moved_games, moved_vehicles] = r
+        on_catapult = self.lookup(self.catapult_grid, q, r)
+        self.range_bonus[moved_games[on_catapult], moved_vehicles[on_catapult]] = True
+        vehicle_types = self.type[moved_vehicles]
+        repaired = (
+            self.lookup(self.heavy_repair_grid, q, r)
+            & (
+                (vehicle_types == VEHICLE_TYPE_IDS[HEAVY_TANK])
+                | (vehicle_types == VEHICLE_TYPE_IDS[TANK_DESTROYER])
+            )
+        ) | (
+            self.lookup(self.light_repair_grid, q, r)
+            & (vehicle_types == VEHICLE_TYPE_IDS[MEDIUM_TANK])
+        )
+        self.hp[moved_games[repaired], moved_vehicles[repaired]] = self.spawn_hp[
+            moved_vehicles[repaired]
+        ]
+
+        distance_before = hex_distance_to_center(old_q, old_r)
+        distance_after = np.where(
+            moved, hex_distance_to_center(new_q, new_r), distance_before
+        )
+        closer_by = distance_before - distance_after
+        rewards = np.select(
+            [
+                illegal,
+                closer_by == 3,
+                closer_by == 2,
+                closer_by > 0,
+                closer_by < 0,
+                ~moved,
+            ],
+            [
+                -REWARD_FOR_CORRECT_MOVE,
+                REWARD_FOR_CORRECT_MOVE * 10,
+                REWARD_FOR_CORRECT_MOVE * 5,
+                REWARD_FOR_CORRECT_MOVE * 2,
+                -(REWARD_FOR_CORRECT_MOVE * 4),
+                -(REWARD_FOR_CORRECT_MOVE * 0.5),
+            ],
+            REWARD_FOR_CORRECT_MOVE * 0.1,
+        )
+        return np.where(self.owner[vehicles] == self.rl_player_index, rewards, 0)
+
+    def may_attack(self, games: np.ndarray, attackers: np.ndarray) -> np.ndarray:
+        """`Game.may_attack` of every attacking player against every player, shape (games, players)."""
+        matrix = self.neutrality_matrix[games]
+        got_attacked_by_target = matrix[np.arange(len(games)), :, attackers] == 1
+        target_got_attacked = (matrix == 1).any(axis=1)
+        return got_attacked_by_target | ~target_got_attacked
+
+    def targetable(self, games: np.ndarray, vehicles: np.ndarray) -> np.ndarray:
+        """Vehicles the acting vehicles may shoot at, shape (games, vehicles)."""
+        attackers = self.owner[vehicles]
+        may_attack = self.may_attack(games, attackers)
+        return (self.owner[None, :] != attackers[:, None]) & may_attack[:, self.owner]
+
+    def direct_fire_targets(self, games: np.ndarray, vehicles: np.ndarray):
+        """
+        Target choice of `ReinforcementLearningPlayer` for vehicles other than Tank Destroyer.
+        Returns mask of games with a target and the chosen target coordinates.
+        """
+        rows = np.arange(len(games))
+        bonus = self.range_bonus[games, vehicles].astype(int)
+        offsets = self.fire_offsets[self.type[vehicles], bonus]
+        valid = self.fire_valid[self.type[vehicles], bonus]
+        hex_q = self.q[games, vehicles][:, None] + offsets[..., 0]
+        hex_r = self.r[games, vehicles][:, None] + offsets[..., 1]
+
+        q = self.q[games]
+        r = self.r[games]
+        candidates = (
+            (q[:, None, :] == hex_q[:, :, None])
+            & (r[:, None, :] == hex_r[:, :, None])
+            & valid[:, :, None]
+            & self.targetable(games, vehicles)[:, None, :]
+        )
+        # Prefer targets in capture area, then lower hp, then the first one found
+        in_capture_area = self.lookup(self.capture_grid, q, r)
+        preference = np.where(
+            in_capture_area, 0, NOT_PREFERRED
+        ) + self.hp[games].astype(int)
+        preference = np.where(candidates, preference[:, None, :], 2 * NOT_PREFERRED)
+        best = preference.reshape(len(games), -1).argmin(axis=1)
+        target = best % self.num_vehicles
+        has_target = candidates.reshape(len(games), -1).any(axis=1)
+        return has_target, q[rows, target], r[rows, target]
+
+    def tank_destroyer_targets(self, games: np.ndarray, vehicles: np.ndarray):
+        """
+        Target choice of `ReinforcementLearningPlayer` for Tank Destroyers.
+        Returns mask of games with a target, chosen direction and hits of every direction
+        with shape (games, directions, hexes, vehicles).
+        """
+        rows = np.arange(len(games))
+        bonus = self.range_bonus[games, vehicles].astype(int)
+        offsets = self.td_offsets[bonus]
+        hex_q = self.q[games, vehicles][:, None, None] + offsets[..., 0]
+        hex_r = self.r[games, vehicles][:, None, None] + offsets[..., 1]
+        open_hexes = self.td_valid[bonus] & np.logical_and.accumulate(
+            ~self.lookup(self.obstacle_grid, hex_q, hex_r), axis=2
+        )
+
+        q = self.q[games]
+        r = self.r[games]
+        hits = (
+            (q[:, None, None, :] == hex_q[..., None])
+            & (r[:, None, None, :] == hex_r[..., None])
+            & open_hexes[..., None]
+            & self.targetable(games, vehicles)[:, None, None, :]
+        )
+        hit_count = hits.sum(axis=(2, 3))
+        single_target = hits.reshape(len(games), 6, -1).argmax(axis=2) % self.num_vehicles
+        entry_in_capture_area = self.lookup(
+            self.capture_grid, hex_q[:, :, 0], hex_r[:, :, 0]
+        )
+        in_capture_area = self.lookup(self.capture_grid, q, r)
+        hp = self.hp[games]
+
+        has_target = np.zeros(len(games), dtype=bool)
+        stopped = np.zeros(len(games), dtype=bool)
+        direction = np.zeros(len(games), dtype=int)
+        target_hp = np.zeros(len(games), dtype=int)
+        target_in_capture_area = np.zeros(len(games), dtype=bool)
+        for index in range(6):
+            # If 2 or more vehicles to be hit, shoot there
+            several = ~stopped & (hit_count[:, index] > 1)
+            direction[several] = index
+            has_target |= several
+            stopped |= several
+
+            vehicle = single_target[:, index]
+            vehicle_hp = hp[rows, vehicle]
+            vehicle_in_capture_area = in_capture_area[rows, vehicle]
+            take = (
+                ~stopped
+                & (hit_count[:, index] == 1)
+                & (
+                    ~has_target
+                    | (vehicle_in_capture_area & ~target_in_capture_area)
+                    | (~target_in_capture_area & (target_hp > vehicle_hp))
+                    | (
+                        target_in_capture_area
+                        & vehicle_in_capture_area
+                        & (target_hp > vehicle_hp)
+                    )
+                )
+            )
+            direction[take] = index
+            target_hp[take] = vehicle_hp[take]
+            target_in_capture_area[take] = entry_in_capture_area[take, index]
+            has_target |= take
+        return has_target, direction, hits
+
+    def can_shoot(self, games: np.ndarray) -> np.ndarray:
+        vehicles = self.acting_vehicles()[games]
+        result = np.zeros(len(games), dtype=bool)
+        tank_destroyer = self.type[vehicles] == VEHICLE_TYPE_IDS[TANK_DESTROYER]
+        if tank_destroyer.any():
+            result[tank_destroyer] = self.tank_destroyer_targets(
+                games[tank_destroyer], vehicles[tank_destroyer]
+            )[0]
+        if (~tank_destroyer).any():
+            result[~tank_destroyer] = self.direct_fire_targets(
+                games[~tank_destroyer], vehicles[~tank_destroyer]
+            )[0]
+        return result
+
+    def shoot(self, games: np.ndarray) -> np.ndarray:
+        """Shoot action of `ReinforcementLearningPlayer` with `Game.shoot` rules."""
+        vehicles = self.acting_vehicles()[games]
+        # Hit vehicles in the order `Game.shoot` processes them
+        slot_count = self.td_offsets.shape[2] * self.num_vehicles
+        hit_order = np.zeros((len(games), slot_count), dtype=int)
+        hit_mask = np.zeros((len(games), slot_count), dtype=bool)
+        has_target = np.zeros(len(games), dtype=bool)
+
+        tank_destroyer = self.type[vehicles] == VEHICLE_TYPE_IDS[TANK_DESTROYER]
+        td_rows = np.nonzero(tank_destroyer)[0]
+        other_rows = np.nonzero(~tank_destroyer)[0]
+        if len(td_rows):
+            td_has_target, direction, hits = self.tank_destroyer_targets(
+                games[td_rows], vehicles[td_rows]
+            )
+            direction_hits = hits[np.arange(len(td_rows)), direction]
+            hit_order[td_rows] = np.arange(slot_count) % self.num_vehicles
+            hit_mask[td_rows] = direction_hits.reshape(len(td_rows), -1)
+            hit_mask[td_rows] &= td_has_target[:, None]
+            has_target[td_rows] = td_has_target
+        if len(other_rows):
+            other_has_target, target_q, target_r = self.direct_fire_targets(
+                games[other_rows], vehicles[other_rows]
+            )
+            # `Game.shoot` hits the first vehicle standing on the target
+            hit_order[other_rows, 0] = (
+                (self.q[games[other_rows]] == target_q[:, None])
+                & (self.r[games[other_rows]] == target_r[:, None])
+            ).argmax(axis=1)
+            hit_mask[other_rows, 0] = other_has_target
+            has_target[other_rows] = other_has_target
+
+        attackers = self.owner[vehicles]
+        rows, slots = np.nonzero(hit_mask)
+        hit_games = games[rows]
+        hit_vehicles = hit_order[rows, slots]
+        self.neutrality_matrix[hit_games, attackers[rows], self.owner[hit_vehicles]] = 1
+        self.hp[hit_games, hit_vehicles] -= self.damage[vehicles[rows]]
+        destroyed = self.hp[hit_games, hit_vehicles] <= 0
+        np.add.at(
+            self.kill_points,
+            (hit_games[destroyed], attackers[rows][destroyed]),
+            self.destruction_points[hit_vehicles[destroyed]],
+        )
+
+        # Every hit adds a reward, destroying a tank replaces the reward gained so far
+        destroyed_mask = np.zeros_like(hit_mask)
+        destroyed_mask[rows[destroyed], slots[destroyed]] = True
+        slot_index = np.arange(hit_mask.shape[1])
+        last_destroyed = np.where(destroyed_mask, slot_index, -1).max(axis=1)
+        hits_after = (hit_mask & (slot_index > last_destroyed[:, None])).sum(axis=1)
+        rewards = np.where(
+            last_destroyed >= 0,
+            REWARD_FOR_SHOT_DESTROYING_TANK + REWARD_FOR_SUCCESSFULL_SHOT * hits_after,
+            REWARD_FOR_SUCCESSFULL_SHOT * hits_after,
+        )
+        rewards = np.where(attackers == self.rl_player_index, rewards, 0)
+
+        shooters = games[has_target]
+        shooter_vehicles = vehicles[has_target]
+        off_catapult = ~self.lookup(
+            self.catapult_grid,
+            self.q[shooters, shooter_vehicles],
+            self.r[shooters, shooter_vehicles],
+        )
+        self.range_bonus[shooters[off_catapult], shooter_vehicles[off_catapult]] = False
+        return rewards
+
+    def end_tank_action(self, games: np.ndarray) -> np.ndarray:
+        """Advance tank and player index, respawn vehicles and end rounds."""
+        rewards = np.zeros(len(games))
+        self.current_tank_index[games] += 1
+        turn_ended = (
+            self.current_tank_index[games] == self.squad_size[self.current_index[games]]
+        )
+        ended = games[turn_ended]
+        if len(ended) == 0:
+            return rewards
+        self.num_turns[ended] += 1
+        self.current_tank_index[ended] = 0
+
+        # Respawn vehicles
+        dead = self.hp[ended] <= 0
+        self.q[ended] = np.where(dead, self.spawn_q, self.q[ended])
+        self.r[ended] = np.where(dead, self.spawn_r, self.r[ended])
+        self.hp[ended] = np.where(dead, self.spawn_hp, self.hp[ended])
+
+        round_ended = self.current_index[ended] + 1 == self.num_players
+        if round_ended.any():
+            rewards[np.nonzero(turn_ended)[0][round_ended]] = self.end_of_round(
+                ended[round_ended]
+            )
+        self.current_index[ended] = (self.current_index[ended] + 1) % self.num_players
+        return rewards
+
+    def end_of_round(self, games: np.ndarray) -> np.ndarray:
+        """`Game.end_of_round`: award capture points and check if games are over."""
+        in_capture_area = self.lookup(self.capture_grid, self.q[games], self.r[games])
+        players_in_capture_area = (
+            in_capture_area.astype(np.int16) @ self.owner_one_hot > 0
+        ).sum(axis=1)
+        awarded = (players_in_capture_area < self.num_players)[:, None] & in_capture_area
+        self.capture_points[games] = np.where(
+            in_capture_area, self.capture_points[games] + awarded, 0
+        )
+        rewards = REWARD_FOR_CAPTURE * (
+            awarded & (self.owner == self.rl_player_index)
+        ).sum(axis=1)
+
+        winners = self.check_win(games)
+        # Simultaneous winners are decided by kill points, the later player wins ties
+        winner_kill_points = np.where(winners, self.kill_points[games], -1)
+        best = winners & (
+            winner_kill_points == winner_kill_points.max(axis=1)[:, None]
+        )
+        winner = self.num_players - 1 - best[:, ::-1].argmax(axis=1)
+        game_won = winners.any(axis=1)
+        self.done[games[game_won]] = True
+        return np.where(
+            game_won,
+            np.where(winner == self.rl_player_index, REWARD_FOR_WIN, -REWARD_FOR_WIN),
+            rewards,
+        )
+
+    def check_win(self, games: np.ndarray) -> np.ndarray:
+        """Update capture points of players, return mask of players that won."""
+        points = self.capture_points[games].astype(np.int32) @ self.owner_one_hot
+        self.player_capture_points[games] = points
+        return points >= CAPTURE_POINTS_TO_WIN
+
+    def determine_winner_max_turns(self, games: np.ndarray) -> np.ndarray:
+        """`Game.determine_winner_max_turns` for every game."""
+        kill_points = self.kill_points[games]
+        with_max_kill_points = kill_points == kill_points.max(axis=1)[:, None]
+        # A draw is only judged from the first player's perspective
+        draw = np.where(
+            (self.rl_player_index == 0) & ~with_max_kill_points[:, 0],
+            -REWARD_FOR_DRAW,
+            REWARD_FOR_DRAW,
+        )
+        win = np.where(
+            kill_points.argmax(axis=1) == self.rl_player_index,
+            REWARD_FOR_WIN,
+            -REWARD_FOR_WIN,
+        )
+        return np.where(with_max_kill_points.sum(axis=1) > 1, draw, win)
+
+    def action_masks(self, mask: np.ndarray = None) -> np.ndarray:
+        """`Game.get_action_mask` of the current tank in every match, shape (games, 37)."""
+        games = np.arange(self.num_games) if mask is None else np.nonzero(mask)[0]
+        vehicles = self.acting_vehicles()[games]
+        new_q = self.q[games, vehicles][:, None] + ACTION_DQ
+        new_r = self.r[games, vehicles][:, None] + ACTION_DR
+        occupied = (
+            (self.q[games][:, None, :] == new_q[..., None])
+            & (self.r[games][:, None, :] == new_r[..., None])
+        ).any(axis=2)
+        moves = (
+            (ACTION_DISTANCE <= self.sp[vehicles][:, None])
+            & ~occupied
+            & ~self.lookup(self.obstacle_grid, new_q, new_r)
+            & self.on_board(new_q, new_r)
+        )
+        shoot = self.can_shoot(games) | ~moves.any(axis=1)
+        return np.concatenate([moves, shoot[:, None]], axis=1)
+
+    def greedy_actions(self, mask: np.ndarray = None) -> np.ndarray:
+        """
+        Vectorized stand in for the scripted `Player`: shoot when there is a target,
+        otherwise take the move that gets closest to the capture area. Shooting with nothing
+        to shoot is used to stay in place.
+        """
+        if mask is None:
+            mask = ~self.done
+        actions = np.full(self.num_games, SHOOT_ACTION)
+        games = np.nonzero(mask)[0]
+        if len(games) == 0:
+            return actions
+        games = games[~self.can_shoot(games)]
+        vehicles = self.acting_vehicles()[games]
+        q = self.q[games, vehicles]
+        r = self.r[games, vehicles]
+        new_q = q[:, None] + ACTION_DQ
+        new_r = r[:, None] + ACTION_DR
+        occupied = (
+            (self.q[games][:, None, :] == new_q[..., None])
+            & (self.r[games][:, None, :] == new_r[..., None])
+        ).any(axis=2)
+        legal = (
+            (ACTION_DISTANCE <= self.sp[vehicles][:, None])
+            & ~occupied
+            & ~self.lookup(self.obstacle_grid, new_q, new_r)
+            & self.on_board(new_q, new_r)
+        )
+        distance = np.where(
+            legal,
+            self.lookup(self.capture_distance_grid, new_q, new_r, NOT_PREFERRED),
+            NOT_PREFERRED,
+        )
+        best = distance.argmin(axis=1)
+        improves = distance[np.arange(len(games)), best] < self.lookup(
+            self.capture_distance_grid, q, r, NOT_PREFERRED
+        )
+        actions[games[improves]] = best[improves]
+        return actions
+
+    def observations(self) -> np.ndarray:
+        """Observation of every match, laid out like `TankEnv.prepare_observation`."""
+        n, v = self.num_games, self.num_vehicles
+        vehicle_data = np.stack(
+            [
+                self.q,
+                self.r,
+                np.broadcast_to(self.owner, (n, v)),
+                np.broadcast_to(self.vehicle_index, (n, v)),
+                self.hp,
+                np.broadcast_to(self.sp, (n, v)),
+                self.capture_points,
+            ],
+            axis=2,
+        ).astype(np.int32)
+        return np.concatenate(
+            [
+                vehicle_data.reshape(n, -1),
+                self.kill_points,
+                self.neutrality_matrix.reshape(n, -1),
+                self.current_index[:, None],
+                self.current_tank_index[:, None],
+            ],
+            axis=1,
+            dtype=np.int32,
+        )
+
+
+if __name__ == "__main__":
+    # Check that both engines give the same rewards for the same actions of every seat
+
+    class OpponentSeat(ReinforcementLearningPlayer):
+        """Acts like the learning player, `BatchedGame` only rewards the learning player's actions."""
+
+        def make_action(self, map, current_tank_index, players, action):
+            result, _ = super().make_action(map, current_tank_index, players, action)
+            return result, 0
+
+    rng = np.random.default_rng(0)
+    for rl_player_index in range(NUM_PLAYERS):
+        for episode in range(10):
+            game = Game(False, rl_player_index)
+            game.players = [
+                (ReinforcementLearningPlayer if index == rl_player_index else OpponentSeat)(
+                    f"Player{index + 1}", color, index
+                )
+                for index, color in enumerate((RED, GREEN, BLUE))
+            ]
+            game.place_vehicles(game.players)
+            batched = BatchedGame(1, rl_player_index, template=game)
+            while not game.done:
+                action = rng.choice(np.flatnonzero(batched.action_masks()[0]))
+                reward = game.make_game_action(int(action))
+                assert batched.make_game_action(np.array([action]))[0] == reward
+                assert batched.done[0] == game.done
+    print("Batched rewards match Game for every reinforcement learning player index")
@@ -0,0 +1,334 @@
+"""
+Benchmarks for the simulator, the gym env and the GUI on fixed seeds and scenarios.
+
+Scenarios, each on every entry of `obstacle_layouts`:
+    opening     vehicles on their spawn tiles
+    congestion  all vehicles packed on the free tiles closest to the capture area
+    full_game   whole games with seeded random actions for the learning player
+
+The path benchmarks cover both the capture distance field the scripted bots route with and the
+older multi-goal path search.
+
+Every benchmark reports calls per second, per call latency percentiles and the memory
+allocated per call (peak traced by tracemalloc), and is compared with a saved baseline.
+
+    python benchmark.py                   run everything, compare with benchmark_baseline.json
+    python benchmark.py --save-baseline   run everything, save the results as the new baseline
+    python benchmark.py --filter gui      only run benchmarks with "gui" in their name
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+import numpy as np
+from game import *
+from player import *
+from tankenv import TankEnv
+
+SEED = 0
+BASELINE_PATH = "benchmark_baseline.json"
+# Latency change against the baseline that is reported as faster / slower
+REGRESSION_THRESHOLD = 0.1
+FULL_GAMES = 3
+SCENARIO_REPEATS = 20
+ENV_RESETS = 50
+ENV_EPISODES = 3
+GUI_DRAWS = 50
+LAYOUTS = list(obstacle_layouts)
+
+
+def create_game(layout: str) -> Game:
+    """Headless game with the env's player setup on the given obstacle layout."""
+    game = Game(False, 0)
+    game.obstacles = obstacle_layouts[layout]
+    game.players = [
+        ReinforcementLearningPlayer("Player1", RED, 0),
+        Player("Player2", GREEN, 1),
+        Player("Player3", BLUE, 2),
+    ]
+    game.place_vehicles(game.players)
+    return game
+
+
+def opening_scenario(layout: str) -> Game:
+    return create_game(layout)
+
+
+def congestion_scenario(layout: str) -> Game:
+    """Vehicles moved onto the free tiles closest to the map center, in vehicle order."""
+    game = create_game(layout)
+    free_tiles = [
+        tile
+        for tile in game.board.spiral((0, 0), game.map_radius)
+        if game.board.is_on_board(tile) and tile not in game.board.obstacles
+    ]
+    for vehicle, tile in zip(game.vehicles, free_tiles):
+        game.set_vehicle_position(vehicle, tile)
+    return game
+
+
+SCENARIOS = {"opening": opening_scenario, "congestion": congestion_scenario}
+
+
+class CallTimer:
+    """Measures the calls a benchmark makes through it, either their latency or their allocations."""
+
+    def __init__(self, trace_allocations: bool = False):
+        self.trace_allocations = trace_allocations
+        self.latencies: list[float] = []
+        self.allocations: list[int] = []
+
+    def __call__(self, function, *args, **kwargs):
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+            result = function(*args, **kwargs)
+            self.allocations.append(tracemalloc.get_traced_memory()[1] - start_memory)
+            return result
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.latencies.append(time.perf_counter() - start)
+        return result
+
+
+def bench_game_step_full_game(layout: str):
+    def run(timer: CallTimer):
+        for game_index in range(FULL_GAMES):
+            rng = random.Random(SEED + game_index)
+            game = create_game(layout)
+            while not game.done:
+                timer(game.make_game_action, rng.randrange(SHOOT_ACTION + 1))
+
+    return run
+
+
+def bench_game_step_scenario(scenario: str, layout: str):
+    """One round (every player moves all tanks) from the scenario, repeated."""
+
+    def run(timer: CallTimer):
+        game = SCENARIOS[scenario](layout)
+        start = game.snapshot()
+        rng = random.Random(SEED)
+        for _ in range(SCENARIO_REPEATS):
+            game.restore(start)
+            for _ in range(len(game.vehicles)):
+                timer(game.make_game_action, rng.randrange(SHOOT_ACTION + 1))
+
+    return run
+
+
+def bench_find_best_path(scenario: str, layout: str):
+    def run(timer: CallTimer):
+        game = SCENARIOS[scenario](layout)
+        for _ in range(SCENARIO_REPEATS):
+            for vehicle in game.vehicles:
+                timer(
+                    game.find_best_path_multiple_goals,
+                    vehicle,
+                    game.capture_area,
+                    game.vehicle_map,
+                    game.map_radius,
+                )
+
+    return run
+
+
+def bench_capture_distance_field(scenario: str, layout: str):
+    """Repairing the capture distance fields after a vehicle moves to a free tile and back."""
+
+    def run(timer: CallTimer):
+        game = SCENARIOS[scenario](layout)
+        for speed_points in {vehicle.sp for vehicle in game.vehicles}:
+            game.get_capture_distance_field(speed_points)
+        for _ in range(SCENARIO_REPEATS):
+            for vehicle in game.vehicles:
+                start = vehicle.position
+                free_tiles = [
+                    tile
+                    for tile in game.board.reach(start, 1)
+                    if tile not in game.vehicle_map
+                ]
+                if not free_tiles:
+                    continue
+                timer(game.set_vehicle_position, vehicle, free_tiles[0])
+                timer(game.set_vehicle_position, vehicle, start)
+
+    return run
+
+
+def bench_find_next_move(scenario: str, layout: str):
+    """The scripted bots' move search, avoiding the tiles enemies threaten."""
+
+    def run(timer: CallTimer):
+        game = SCENARIOS[scenario](layout)
+        for _ in range(SCENARIO_REPEATS):
+            for vehicle in game.vehicles:
+                timer(
+                    game.find_next_move_to_capture_area,
+                    vehicle,
+                    game.get_enemy_threat(vehicle.owning_player.index),
+                )
+
+    return run
+
+
+def bench_get_shootable_vehicles(scenario: str, layout: str):
+    def run(timer: CallTimer):
+        game = SCENARIOS[scenario](layout)
+        for _ in range(SCENARIO_REPEATS):
+            for vehicle in game.vehicles:
+                timer(
+                    vehicle.get_shootable_vehicles,
+                    game.obstacles,
+                    game.vehicle_map,
+                    game.may_attack,
+                )
+
+    return run
+
+
+def bench_env_reset(timer: CallTimer):
+    env = TankEnv(False)
+    for seed in range(ENV_RESETS):
+        timer(env.reset, seed=SEED + seed)
+
+
+def bench_env_step(timer: CallTimer):
+    env = TankEnv(False)
+    for episode in range(ENV_EPISODES):
+        rng = random.Random(SEED + episode)
+        env.reset(seed=SEED + episode)
+        done = False
+        while not done:
+            _, _, done, _, _ = timer(env.step, rng.randrange(SHOOT_ACTION + 1))
+
+
+def bench_gui_draw(scenario: str):
+    def run(timer: CallTimer):
+        game = SCENARIOS[scenario]("obstacle_layout_stage4")
+        gui = game.get_gui(offscreen=True)
+        for _ in range(GUI_DRAWS):
+            timer(gui.draw_hexagonal_map, game)
+
+    return run
+
+
+def get_benchmarks() -> dict:
+    """Benchmark name -> function running its workload through a `CallTimer`."""
+    benchmarks = {}
+    for layout in LAYOUTS:
+        benchmarks[f"game_step/full_game/{layout}"] = bench_game_step_full_game(layout)
+        for scenario in SCENARIOS:
+            benchmarks[f"game_step/{scenario}/{layout}"] = bench_game_step_scenario(
+                scenario, layout
+            )
+    for layout in LAYOUTS:
+        for scenario in SCENARIOS:
+            benchmarks[f"find_best_path/{scenario}/{layout}"] = bench_find_best_path(
+                scenario, layout
+            )
+            benchmarks[
+                f"capture_distance_field/{scenario}/{layout}"
+            ] = bench_capture_distance_field(scenario, layout)
+            benchmarks[f"find_next_move/{scenario}/{layout}"] = bench_find_next_move(
+                scenario, layout
+            )
+            benchmarks[
+                f"get_shootable_vehicles/{scenario}/{layout}"
+            ] = bench_get_shootable_vehicles(scenario, layout)
+    benchmarks["env/reset"] = bench_env_reset
+    benchmarks["env/step"] = bench_env_step
+    for scenario in SCENARIOS:
+        benchmarks[f"gui/draw_hexagonal_map/{scenario}"] = bench_gui_draw(scenario)
+    return benchmarks
+
+
+def run_benchmark(run) -> dict:
+    """Warm up, time the workload, then run it again with tracemalloc for allocations."""
+    with contextlib.redirect_stdout(io.StringIO()):  # The game prints collisions and winners
+        run(CallTimer())
+        timer = CallTimer()
+        run(timer)
+        allocation_timer = CallTimer(trace_allocations=True)
+        tracemalloc.start()
+        try:
+            run(allocation_timer)
+        finally:
+            tracemalloc.stop()
+
+    latencies = np.array(timer.latencies)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {
+        "calls": len(latencies),
+        "calls_per_second": len(latencies) / latencies.sum(),
+        "p50_us": p50 * 1e6,
+        "p90_us": p90 * 1e6,
+        "p99_us": p99 * 1e6,
+        "alloc_kib_per_call": float(np.mean(allocation_timer.allocations)) / 1024,
+    }
+
+
+def compare(result: dict, baseline: dict | None) -> str:
+    if baseline is None:
+        return "new"
+    # Mean latency is the inverse of the call rate
+    change = baseline["calls_per_second"] / result["calls_per_second"] - 1
+    label = f"{change:+.0%}"
+    if change > REGRESSION_THRESHOLD:
+        label += " slower"
+    elif change < -REGRESSION_THRESHOLD:
+        label += " faster"
+    return label
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="save the results as the new baseline"
+    )
+    parser.add_argument("--filter", default="", help="only run benchmarks containing this")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+
+    print(
+        f"{'benchmark':<64} {'calls/s':>10} {'p50 us':>9} {'p90 us':>9} {'p99 us':>9} "
+        f"{'KiB/call':>9}  baseline"
+    )
+    results = {}
+    for name, run in get_benchmarks().items():
+        if args.filter not in name:
+            continue
+        try:
+            result = run_benchmark(run)
+        except ImportError as error:  # pygame is only needed for the GUI benchmarks
+            print(f"{name:<64} skipped: {error}")
+            continue
+        results[name] = result
+        print(
+            f"{name:<64} {result['calls_per_second']:>10.0f} {result['p50_us']:>9.1f} "
+            f"{result['p90_us']:>9.1f} {result['p99_us']:>9.1f} "
+            f"{result['alloc_kib_per_call']:>9.2f}  {compare(result, baseline.get(name))}"
+        )
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(
+                {"python": platform.python_version(), "seed": SEED, "results": results},
+                file,
+                indent=2,
+            )
+        print(f"Saved baseline to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
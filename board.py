@@ -0,0 +1,382 @@
+import heapq
+import numpy as np
+from hex_utility import *
+
+# Rings up to this radius are built eagerly for every tile of the board
+PRECOMPUTED_RADIUS = 4
+# Move tables are built eagerly for every tile of the board up to this many speed points
+PRECOMPUTED_SPEED_POINTS = 3
+
+# Bit flags of the tile attribute grid
+ON_BOARD = 1 << 0
+OBSTACLE = 1 << 1
+CAPTURE_AREA = 1 << 2
+LIGHT_REPAIR = 1 << 3
+HEAVY_REPAIR = 1 << 4
+CATAPULT = 1 << 5
+# Tiles of the spawn edge of player p have the flag SPAWN_EDGE << p
+SPAWN_EDGE = 1 << 6
+STATIC_FLAGS = [ON_BOARD, OBSTACLE, CAPTURE_AREA, LIGHT_REPAIR, HEAVY_REPAIR, CATAPULT]
+# Spawn edge of each player as (axial coordinate, sign), the edge where q, r or s = -q - r is
+# sign * map radius. Three players spawn on every other edge.
+SPAWN_EDGES = [(0, 1), (2, 1), (1, 1), (0, -1), (2, -1), (1, -1)]
+
+
+class BoardIndex:
+    """
+    Static lookup tables for one hexagonal board (map radius, obstacle layout and the other
+    static tiles).
+
+    Every tile gets an integer id (same order the map is drawn in). Neighbor tables,
+    rings, spirals and radius queries are built once and returned as tuples, so the
+    results are shared between callers and must not be mutated.
+    Centers outside the board are still supported, they are computed on first use and cached.
+    """
+
+    def __init__(
+        self,
+        map_radius: int,
+        obstacles,
+        capture_area=(),
+        light_repair_stations=(),
+        heavy_repair_stations=(),
+        catapults=(),
+    ):
+        self.map_radius = map_radius
+        self.obstacles = frozenset(obstacles)
+
+        self.tiles: list[tuple[int, int]] = []
+        for q in range(-map_radius, map_radius + 1):
+            r1 = max(-map_radius, -q - map_radius)
+            r2 = min(map_radius, -q + map_radius)
+            for r in range(r1, r2 + 1):
+                self.tiles.append((q, r))
+        self.tile_ids = {tile: index for index, tile in enumerate(self.tiles)}
+        self.num_tiles = len(self.tiles)
+        self.build_tile_flags(
+            [
+                (obstacles, OBSTACLE),
+                (capture_area, CAPTURE_AREA),
+                (light_repair_stations, LIGHT_REPAIR),
+                (heavy_repair_stations, HEAVY_REPAIR),
+                (catapults, CATAPULT),
+            ]
+        )
+
+        coordinates = np.array(self.tiles, dtype=np.int16)
+        q = coordinates[:, 0]
+        r = coordinates[:, 1]
+        self.distances = (
+            np.abs(q[:, None] - q[None, :])
+            + np.abs(r[:, None] - r[None, :])
+            + np.abs((q + r)[:, None] - (q + r)[None, :])
+        ) // 2
+
+        # Adjacent tile ids that are on the board and are not obstacles
+        self.neighbors: list[tuple[int, ...]] = []
+        for tile in self.tiles:
+            ids = []
+            for direction in range(6):
+                neighbor = hexagon_neighbor(tile, direction)
+                if neighbor in self.tile_ids and neighbor not in self.obstacles:
+                    ids.append(self.tile_ids[neighbor])
+            self.neighbors.append(tuple(ids))
+
+        self._rings = {}
+        self._spirals = {}
+        self._tiles_in_radius = {}
+        self._tiles_in_radius_true = {}
+        self._discs = {}
+        self._immediate_neighbors = {}
+        self._rays = {}
+        self._reach = {}
+        self._bounded_reach = {}
+        self._move_sources = {}
+        self._move_targets = {}
+        self._capture_distance_fields = {}
+        # (position, vehicle type, range bonus) -> `Vehicle.get_attack_template` result
+        self.attack_templates = {}
+        for tile in self.tiles:
+            self.valid_immediate_neighbors(tile)
+            for radius in range(1, PRECOMPUTED_RADIUS + 1):
+                self.ring(tile, radius)
+                self.spiral(tile, radius)
+                self.tiles_in_radius(tile, radius)
+                self.tiles_in_radius_true(tile, radius)
+                self.disc(tile, radius)
+            for speed_points in range(1, PRECOMPUTED_SPEED_POINTS + 1):
+                self.reach(tile, speed_points)
+                self.bounded_reach(tile, speed_points, map_radius)
+
+    def build_tile_flags(self, static_tiles):
+        """
+        Dense tile attribute grid `flag_grid` indexed by [q + map_radius, r + map_radius], with
+        the bit flags above. `tile_flags` has the same flags by position for the rule checks,
+        tiles off the board are missing from it (read it with `.get(position, 0)`).
+        """
+        size = 2 * self.map_radius + 1
+        self.flag_grid = np.zeros((size, size), dtype=np.uint16)
+        for q, r in self.tiles:
+            self.flag_grid[q + self.map_radius, r + self.map_radius] = ON_BOARD
+        for tiles, flag in static_tiles:
+            for q, r in tiles:
+                if (q, r) in self.tile_ids:
+                    self.flag_grid[q + self.map_radius, r + self.map_radius] |= flag
+        for player, (coordinate, sign) in enumerate(SPAWN_EDGES):
+            for q, r in self.tiles:
+                if (q, r, -q - r)[coordinate] == sign * self.map_radius:
+                    self.flag_grid[q + self.map_radius, r + self.map_radius] |= (
+                        SPAWN_EDGE << player
+                    )
+        self.tile_flags = {
+            (q, r): int(self.flag_grid[q + self.map_radius, r + self.map_radius])
+            for q, r in self.tiles
+        }
+        # Capture tiles a move can end on, the goals of the capture distance fields
+        self.capture_goals = frozenset(
+            tile
+            for tile in self.tiles
+            if self.tile_flags[tile] & (CAPTURE_AREA | OBSTACLE) == CAPTURE_AREA
+        )
+
+    def static_channels(self, num_players: int) -> np.ndarray:
+        """
+        Static tiles as a stack of boolean channels for spatial observations: one per flag in
+        `STATIC_FLAGS`, then the spawn edge of each player. Shape (channels, 2R + 1, 2R + 1).
+        """
+        flags = STATIC_FLAGS + [SPAWN_EDGE << player for player in range(num_players)]
+        return np.stack([(self.flag_grid & flag) != 0 for flag in flags])
+
+    def is_on_board(self, position: tuple[int, int]) -> bool:
+        return position in self.tile_ids
+
+    def distance(self, a: tuple[int, int], b: tuple[int, int]) -> int:
+        """Hex distance, read from the distance matrix when both tiles are on the board."""
+        a_id = self.tile_ids.get(a)
+        b_id = self.tile_ids.get(b)
+        if a_id is not None and b_id is not None:
+            return int(self.distances[a_id, b_id])
+        return (abs(a[0] - b[0]) + abs(a[0] + a[1] - b[0] - b[1]) + abs(a[1] - b[1])) // 2
+
+    def ring(self, center: tuple[int, int], k: int) -> tuple[tuple[int, int], ...]:
+        """Same hexagons (and order) as `cube_ring`."""
+        key = (center, k)
+        result = self._rings.get(key)
+        if result is None:
+            result = tuple(cube_ring(center, k))
+            self._rings[key] = result
+        return result
+
+    def spiral(self, center: tuple[int, int], radius: int) -> tuple[tuple[int, int], ...]:
+        """Same hexagons (and order) as `cube_spiral`."""
+        key = (center, radius)
+        result = self._spirals.get(key)
+        if result is None:
+            result = tuple(cube_spiral(center, radius))
+            self._spirals[key] = result
+        return result
+
+    def tiles_in_radius(
+        self, center: tuple[int, int], radius: int
+    ) -> tuple[tuple[int, int], ...]:
+        """Tiles further than radius / 2 and at most radius away (what direct fire threatens)."""
+        key = (center, radius)
+        result = self._tiles_in_radius.get(key)
+        if result is None:
+            center_q, center_r = center
+            result = tuple(
+                (center_q + dq, center_r + dr)
+                for dq in range(-radius, radius + 1)
+                for dr in range(max(-radius, -dq - radius), min(radius, -dq + radius) + 1)
+                if abs(dq) + abs(dr) + abs(-dq - dr) > radius
+            )
+            self._tiles_in_radius[key] = result
+        return result
+
+    def tiles_in_radius_true(
+        self, center: tuple[int, int], radius: int
+    ) -> tuple[tuple[int, int], ...]:
+        """All tiles at most radius away, tiles at exactly radius / 2 are listed twice."""
+        key = (center, radius)
+        result = self._tiles_in_radius_true.get(key)
+        if result is None:
+            center_q, center_r = center
+            offsets = [
+                (dq, dr)
+                for dq in range(-radius, radius + 1)
+                for dr in range(max(-radius, -dq - radius), min(radius, -dq + radius) + 1)
+            ]
+            inner = [
+                (center_q + dq, center_r + dr)
+                for dq, dr in offsets
+                if abs(dq) + abs(dr) + abs(-dq - dr) <= radius
+            ]
+            outer = [
+                (center_q + dq, center_r + dr)
+                for dq, dr in offsets
+                if abs(dq) + abs(dr) + abs(-dq - dr) >= radius
+            ]
+            result = tuple(inner + outer)
+            self._tiles_in_radius_true[key] = result
+        return result
+
+    def disc(self, center: tuple[int, int], radius: int) -> frozenset[tuple[int, int]]:
+        """Set of all tiles at most radius away from center, for membership tests."""
+        key = (center, radius)
+        result = self._discs.get(key)
+        if result is None:
+            result = frozenset(self.tiles_in_radius_true(center, radius))
+            self._discs[key] = result
+        return result
+
+    def valid_immediate_neighbors(
+        self, position: tuple[int, int]
+    ) -> tuple[tuple[int, int], ...]:
+        """Position itself and its six neighbors, without obstacles."""
+        result = self._immediate_neighbors.get(position)
+        if result is None:
+            result = tuple(
+                (position[0] + direction[0], position[1] + direction[1])
+                for direction in self.tiles_in_radius_true((0, 0), 1)
+                if (position[0] + direction[0], position[1] + direction[1])
+                not in self.obstacles
+            )
+            self._immediate_neighbors[position] = result
+        return result
+
+    def ray(
+        self, position: tuple[int, int], direction: tuple[int, int], length: int
+    ) -> tuple[tuple[int, int], ...]:
+        """Hexes from position along direction up to length, stopping before the first obstacle."""
+        key = (position, direction, length)
+        result = self._rays.get(key)
+        if result is None:
+            hexes = []
+            for distance in range(1, length + 1):
+                hexagon = (
+                    position[0] + direction[0] * distance,
+                    position[1] + direction[1] * distance,
+                )
+                if hexagon in self.obstacles:
+                    break
+                hexes.append(hexagon)
+            result = tuple(hexes)
+            self._rays[key] = result
+        return result
+
+    def reach(self, position: tuple[int, int], speed_points: int) -> tuple[tuple[int, int], ...]:
+        """
+        Tiles a vehicle on position can end a move on with speed_points, ignoring other vehicles.
+        Moves go around obstacles and stay on the board, position itself is not included.
+        """
+        key = (position, speed_points)
+        result = self._reach.get(key)
+        if result is None:
+            start = self.tile_ids.get(position)
+            if start is None:
+                return ()
+            distances = {start: 0}
+            frontier = [start]
+            for distance in range(1, speed_points + 1):
+                next_frontier = []
+                for tile_id in frontier:
+                    for neighbor_id in self.neighbors[tile_id]:
+                        if neighbor_id not in distances:
+                            distances[neighbor_id] = distance
+                            next_frontier.append(neighbor_id)
+                frontier = next_frontier
+            result = tuple(self.tiles[tile_id] for tile_id in distances if tile_id != start)
+            self._reach[key] = result
+        return result
+
+    def bounded_reach(
+        self, position: tuple[int, int], speed_points: int, map_size: int
+    ) -> tuple[tuple[int, int], ...]:
+        """
+        Tiles `Game.get_neighbors` can return for position when no vehicles are in the way:
+        position itself and every tile within speed_points steps around obstacles, entering only
+        tiles with -map_size < q, r < map_size. Ordered by steps, then by coordinates.
+        """
+        key = (position, speed_points, map_size)
+        result = self._bounded_reach.get(key)
+        if result is None:
+            heap = [(0, position)]
+            visited = {position}
+            hexes = []
+            while heap:
+                distance, hexagon = heapq.heappop(heap)
+                hexes.append(hexagon)
+                if distance == speed_points:
+                    continue
+                for coordinate in self.valid_immediate_neighbors(hexagon):
+                    if (
+                        coordinate in visited
+                        or coordinate[0] <= -map_size
+                        or coordinate[0] >= map_size
+                        or coordinate[1] <= -map_size
+                        or coordinate[1] >= map_size
+                    ):
+                        continue
+                    visited.add(coordinate)
+                    heapq.heappush(heap, (distance + 1, coordinate))
+            result = tuple(hexes)
+            self._bounded_reach[key] = result
+        return result
+
+    def move_sources(
+        self, speed_points: int
+    ) -> dict[tuple[int, int], tuple[tuple[int, int], ...]]:
+        """Tile -> tiles a vehicle with speed_points can reach it from in one move."""
+        result = self._move_sources.get(speed_points)
+        if result is None:
+            sources = {tile: [] for tile in self.tiles}
+            for tile, targets in self.move_targets(speed_points).items():
+                for target in targets:
+                    sources[target].append(tile)
+            result = {tile: tuple(tiles) for tile, tiles in sources.items()}
+            self._move_sources[speed_points] = result
+        return result
+
+    def move_targets(
+        self, speed_points: int
+    ) -> dict[tuple[int, int], tuple[tuple[int, int], ...]]:
+        """Tile -> `reach` of the tile with speed_points, for loops over many tiles."""
+        result = self._move_targets.get(speed_points)
+        if result is None:
+            result = {tile: self.reach(tile, speed_points) for tile in self.tiles}
+            self._move_targets[speed_points] = result
+        return result
+
+    def capture_distance_field(self, speed_points: int) -> dict[tuple[int, int], int]:
+        """
+        Move actions a vehicle with speed_points needs to reach the capture area from every tile,
+        ignoring vehicles. Tiles missing from it can't reach the capture area.
+        """
+        field = self._capture_distance_fields.get(speed_points)
+        if field is None:
+            move_sources = self.move_sources(speed_points)
+            queue = [tile for tile in self.tiles if tile in self.capture_goals]
+            field = dict.fromkeys(queue, 0)
+            for tile in queue:
+                for source in move_sources[tile]:
+                    if source not in field:
+                        field[source] = field[tile] + 1
+                        queue.append(source)
+            self._capture_distance_fields[speed_points] = field
+        return field
+
+
+_board_indexes: dict[tuple, BoardIndex] = {}
+
+
+def get_board_index(map_radius: int, obstacles, *static_tiles) -> BoardIndex:
+    """
+    Get the shared `BoardIndex` for map radius, obstacle layout and the other static tiles
+    (capture area, light and heavy repair stations, catapults), building it on first use.
+    """
+    key = (map_radius, tuple(obstacles)) + tuple(tuple(tiles) for tiles in static_tiles)
+    board = _board_indexes.get(key)
+    if board is None:
+        board = BoardIndex(map_radius, obstacles, *static_tiles)
+        _board_indexes[key] = board
+    return board
@@ -1,16 +1,20 @@
-import pygame
-
-WHITE = pygame.Color("white")
-BLACK = pygame.Color("black")
-RED = pygame.Color("red")
-GREEN = pygame.Color("green")
-BLUE = pygame.Color("blue")
-LIGHT_BLUE = pygame.Color(173, 216, 230)
-GRAY = pygame.Color(105, 105, 105)  # Dim gray
-LIGHT_GREEN = pygame.Color(144, 238, 144)
-DARK_GREEN = pygame.Color(0, 150, 0)  # Not too dark
-YELLOW = pygame.Color(255, 250, 205)
-DARKER_YELLOW = pygame.Color(255, 230, 100)
+# Colors are plain RGB tuples, so the game runs without pygame when the GUI is off
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+LIGHT_BLUE = (173, 216, 230)
+GRAY = (105, 105, 105)  # Dim gray
+LIGHT_GREEN = (144, 238, 144)
+DARK_GREEN = (0, 150, 0)  # Not too dark
+YELLOW = (255, 250, 205)
+DARKER_YELLOW = (255, 230, 100)
+ORANGE = (255, 140, 0)
+PURPLE = (128, 0, 128)
+CYAN = (0, 200, 200)
+# Vehicle colors of players 1-6
+PLAYER_COLORS = [RED, GREEN, BLUE, ORANGE, PURPLE, CYAN]
 
 SPG = "SPG"
 LIGHT_TANK = "Light_Tank"
@@ -18,6 +22,31 @@ HEAVY_TANK = "Heavy Tank"
 MEDIUM_TANK = "Medium Tank"
 TANK_DESTROYER = "Tank Destroyer"
 
+VEHICLE_TYPES = [SPG, LIGHT_TANK, HEAVY_TANK, MEDIUM_TANK, TANK_DESTROYER]
+
+# hp, sp, damage, destruction points, shooting range
+VEHICLE_TYPE_STATS = {
+    SPG: (1, 1, 1, 1, 3),
+    LIGHT_TANK: (1, 3, 1, 1, 2),
+    HEAVY_TANK: (3, 1, 1, 3, 1),
+    MEDIUM_TANK: (2, 2, 1, 2, 2),
+    TANK_DESTROYER: (2, 1, 1, 2, 3),
+}
+
+# Move offsets of actions 0-35 (1, 2 and 3 tiles away), action 36 is shoot
+ACTION_DIRECTIONS = [
+    (1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1),
+    (2, -1), (1, -2), (-1, -1), (-2, 0), (-1, 2), (1, 1),
+    (2, 0), (2, -2), (0, -2), (-2, 1), (-2, 2), (0, 2),
+    (0, -3), (1, -3), (2, -3), (3, -3), (3, -2), (3, -1), (3, 0), (2, 1), (1, 2),
+    (0, 3), (-1, 3), (-2, 3), (-3, 3), (-3, 2), (-3, 1), (-3, 0), (-2, -1), (-1, -2),
+]
+ACTIONS_BY_DIRECTION = {
+    direction: action for action, direction in enumerate(ACTION_DIRECTIONS)
+}
+# Speed points a vehicle needs for each move action, actions are ordered by distance
+ACTION_SPEED_POINTS = [1] * 6 + [2] * 12 + [3] * 18
+SHOOT_ACTION = 36
 
 obstacle_layouts = {
     "obstacle_layout_full": [
@@ -0,0 +1,241 @@
+"""
+Evaluate every checkpoint of a training run against the scripted bots.
+
+Episodes of each checkpoint are split into chunks that run on a process pool. Every worker steps
+a group of `TankEnv`s together and picks their actions with one batched `model.predict`.
+Reports win / draw / loss rates, kill and capture points and episode length with 95% confidence
+intervals.
+
+    python evaluate.py models/1715970412 --episodes 200 --workers 8
+"""
+import argparse
+import concurrent.futures
+import math
+import multiprocessing as mp
+import os
+import re
+import sys
+import numpy as np
+from game import CAPTURE_POINTS_TO_WIN
+from tankenv import TankEnv
+
+OUTCOMES = ("win", "draw", "loss")
+# Normal quantile of the 95% confidence intervals
+Z_95 = 1.96
+
+# Checkpoints loaded by this worker process, path -> model
+_models = {}
+
+
+def get_checkpoints(models_dir: str) -> list[str]:
+    """Checkpoint zips of models_dir, ordered by the number of timesteps in their name."""
+    paths = [
+        os.path.join(models_dir, name)
+        for name in os.listdir(models_dir)
+        if name.endswith(".zip")
+    ]
+
+    def timesteps(path):
+        numbers = re.findall(r"\d+", os.path.basename(path))
+        return (int(numbers[-1]) if numbers else -1, path)
+
+    return sorted(paths, key=timesteps)
+
+
+def get_outcome(game, player_index: int) -> str:
+    """Win, draw or loss of player_index in a finished game, by the rules of `Game`."""
+    capture_points = [player.capture_points for player in game.players]
+    kill_points = [player.kill_points for player in game.players]
+    winners = [
+        index
+        for index, points in enumerate(capture_points)
+        if points >= CAPTURE_POINTS_TO_WIN
+    ]
+    if winners:
+        return "win" if game.capture_winner(winners) == player_index else "loss"
+
+    # Game ended by maximum turns, most kill points win
+    most_kill_points = max(kill_points)
+    leaders = [
+        index for index, points in enumerate(kill_points) if points == most_kill_points
+    ]
+    if player_index not in leaders:
+        return "loss"
+    return "win" if len(leaders) == 1 else "draw"
+
+
+def load_model(path: str, use_action_masks: bool):
+    model = _models.get(path)
+    if model is None:
+        if use_action_masks:
+            from sb3_contrib import MaskablePPO
+
+            model = MaskablePPO.load(path, device="cpu")
+        else:
+            from stable_baselines3 import PPO
+
+            model = PPO.load(path, device="cpu")
+        _models[path] = model
+    return model
+
+
+def init_worker():
+    import torch
+
+    # Workers run side by side, one thread each avoids oversubscribing the cores
+    torch.set_num_threads(1)
+    # The game prints the winners of every episode
+    sys.stdout = open(os.devnull, "w")
+
+
+def run_episodes(
+    path: str,
+    episodes: int,
+    num_envs: int,
+    seed: int,
+    deterministic: bool,
+    use_action_masks: bool,
+) -> list[tuple[str, int, int, int]]:
+    """Play episodes with the checkpoint, returns (outcome, kill points, capture points, length) of each."""
+    from stable_baselines3.common.utils import set_random_seed
+
+    set_random_seed(seed)
+    model = load_model(path, use_action_masks)
+    envs = [TankEnv(False) for _ in range(min(num_envs, episodes))]
+    observations = np.stack([env.reset(seed=seed + index)[0] for index, env in enumerate(envs)])
+    lengths = [0] * len(envs)
+    active = [True] * len(envs)
+    started = len(envs)
+    results = []
+
+    while any(active):
+        if use_action_masks:
+            masks = np.stack([env.action_masks() for env in envs])
+            actions, _ = model.predict(
+                observations, deterministic=deterministic, action_masks=masks
+            )
+        else:
+            actions, _ = model.predict(observations, deterministic=deterministic)
+        for index, env in enumerate(envs):
+            if not active[index]:
+                continue
+            observation, _, done, _, _ = env.step(int(actions[index]))
+            lengths[index] += 1
+            if done:
+                player = env.game.players[env.reinfocement_learning_player_index]
+                results.append(
+                    (
+                        get_outcome(env.game, player.index),
+                        player.kill_points,
+                        player.capture_points,
+                        lengths[index],
+                    )
+                )
+                lengths[index] = 0
+                if started < episodes:
+                    observation, _ = env.reset(seed=seed + started)
+                    started += 1
+                else:
+                    active[index] = False
+            observations[index] = observation
+    return results
+
+
+def mean_interval(values) -> tuple[float, float]:
+    """Mean and half width of its 95% confidence interval."""
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return float(values.mean()), math.nan
+    return float(values.mean()), Z_95 * float(values.std(ddof=1)) / math.sqrt(len(values))
+
+
+def rate_interval(successes: int, trials: int) -> tuple[float, float, float]:
+    """Rate with the bounds of its 95% Wilson score interval."""
+    rate = successes / trials
+    denominator = 1 + Z_95**2 / trials
+    center = (rate + Z_95**2 / (2 * trials)) / denominator
+    half_width = (
+        Z_95
+        * math.sqrt(rate * (1 - rate) / trials + Z_95**2 / (4 * trials**2))
+        / denominator
+    )
+    return rate, max(center - half_width, 0.0), min(center + half_width, 1.0)
+
+
+def summarize(results: list[tuple[str, int, int, int]]) -> dict:
+    outcomes, kill_points, capture_points, lengths = zip(*results)
+    summary = {"episodes": len(results)}
+    for outcome in OUTCOMES:
+        summary[outcome] = rate_interval(outcomes.count(outcome), len(results))
+    summary["kill_points"] = mean_interval(kill_points)
+    summary["capture_points"] = mean_interval(capture_points)
+    summary["length"] = mean_interval(lengths)
+    return summary
+
+
+def format_summary(name: str, summary: dict) -> str:
+    rates = "  ".join(
+        f"{outcome} {summary[outcome][0]:5.1%} [{summary[outcome][1]:5.1%}, {summary[outcome][2]:5.1%}]"
+        for outcome in OUTCOMES
+    )
+    means = "  ".join(
+        f"{key} {summary[key][0]:.2f}±{summary[key][1]:.2f}"
+        for key in ("kill_points", "capture_points", "length")
+    )
+    return f"{name}  n={summary['episodes']}  {rates}  {means}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("models_dir", help="directory with the checkpoint zips of a run")
+    parser.add_argument("--episodes", type=int, default=100, help="episodes per checkpoint")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--envs", type=int, default=16, help="envs stepped together by a worker")
+    parser.add_argument(
+        "--chunk", type=int, default=50, help="episodes of one checkpoint per pool task"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--deterministic",
+        action="store_true",
+        help="greedy actions, games have no randomness so every episode plays the same",
+    )
+    parser.add_argument(
+        "--action-masks", action="store_true", help="checkpoints are MaskablePPO models"
+    )
+    args = parser.parse_args()
+
+    checkpoints = get_checkpoints(args.models_dir)
+    if not checkpoints:
+        parser.error(f"no checkpoint zips in {args.models_dir}")
+
+    results = {path: [] for path in checkpoints}
+    with concurrent.futures.ProcessPoolExecutor(
+        args.workers, mp_context=mp.get_context("fork"), initializer=init_worker
+    ) as executor:
+        futures = {}
+        for path in checkpoints:
+            for start in range(0, args.episodes, args.chunk):
+                future = executor.submit(
+                    run_episodes,
+                    path,
+                    min(args.chunk, args.episodes - start),
+                    args.envs,
+                    args.seed + start,
+                    args.deterministic,
+                    args.action_masks,
+                )
+                futures[future] = path
+        for future in concurrent.futures.as_completed(futures):
+            results[futures[future]] += future.result()
+
+    summaries = {path: summarize(results[path]) for path in checkpoints}
+    for path in checkpoints:
+        print(format_summary(os.path.basename(path), summaries[path]))
+    # Best by the lower bound of the win rate, so few lucky episodes don't decide
+    best = max(checkpoints, key=lambda path: summaries[path]["win"][1])
+    print(f"Best checkpoint: {best}")
+
+
+if __name__ == "__main__":
+    main()
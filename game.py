@@ -1,7 +1,8 @@
 import heapq
-from gui import *
+import numpy as np
 from vehicle import *
 from constants import *
+from board import *
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -12,10 +13,15 @@ REWARD_FOR_WIN = 400
 REWARD_FOR_DRAW = 200
 REWARD_FOR_SUCCESSFULL_SHOT = 8
 REWARD_FOR_SHOT_DESTROYING_TANK = 20
+REWARD_FOR_CAPTURE = 30
+CAPTURE_POINTS_TO_WIN = 5
 
-MAX_TURNS = 45
+# Game length in rounds, every player takes one turn per round
+MAX_ROUNDS = 15
 HEX_SIZE = 25
 MAP_RADIUS = 10
+NUM_PLAYERS = 3
+DEFAULT_SQUAD = [SPG, LIGHT_TANK, HEAVY_TANK, MEDIUM_TANK, TANK_DESTROYER]
 
 tank_destroyer_shooting_directions = [
     [(0, -1), (0, -2), (0, -3)],
@@ -28,39 +34,123 @@ tank_destroyer_shooting_directions = [
 
 
 class Game:
-    def __init__(self, use_gui, rl_player_index):
-        self.max_turns = MAX_TURNS
+    def __init__(
+        self, use_gui, rl_player_index, map_radius=MAP_RADIUS, squad=DEFAULT_SQUAD
+    ):
+        # Player turns, set again for the player count in `place_vehicles`
+        self.max_turns = MAX_ROUNDS * NUM_PLAYERS
+        self.vehicles: list[Vehicle] = []
         self.num_turns = 0
-        self.hex_size = HEX_SIZE
-        self.map_radius = MAP_RADIUS
+        # Bigger maps are drawn with smaller hexagons to fit the window
+        self.hex_size = max(HEX_SIZE * MAP_RADIUS // map_radius, 4)
+        self.map_radius = map_radius
+        self.squad = list(squad)
         self.current_index = 0
         self.rl_player_index = rl_player_index
         self.current_tank_index = 0
         self.done = False
         self.use_gui = use_gui
-        self.capture_area = [(0, 0), (1, 0), (-1, 1), (0, 1), (1, -1), (-1, 0), (0, -1)]
-        self.light_repair_stations = [(-3, -3), (-3, 6), (6, -3)]
-        self.heavy_repair_stations = [(-2, -2), (4, -2), (-2, 4)]
-        self.catapults = [(3, -6), (-6, 3), (3, 3)]
+        self.action_result = ""
+        # Static tiles, the board index is built when the obstacles are set below
+        self._capture_area = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, -1), (-1, 0), (0, -1))
+        self._light_repair_stations = ((-3, -3), (-3, 6), (6, -3))
+        self._heavy_repair_stations = ((-2, -2), (4, -2), (-2, 4))
+        self._catapults = ((3, -6), (-6, 3), (3, 3))
         self.catapult_usage_history = []
-        self.vehicles: list[Vehicle] = []
+        self.vehicle_store = VehicleStore()
+        # Position -> vehicles standing there (in `self.vehicles` order), kept up to date on every move
+        self.vehicle_map: dict[tuple[int, int], list[Vehicle]] = {}
+        # Tiles threatened by each player, rebuilt after vehicles move, die or respawn
+        self.threat_map: list[frozenset[tuple[int, int]]] | None = None
+        self.enemy_threats: dict[int, frozenset[tuple[int, int]]] = {}
+        # Speed points -> move actions needed to reach the capture area, repaired as vehicles move
+        self.capture_distance_fields: dict[int, dict[tuple[int, int], int]] = {}
         self.players: list["Player"] = []
         layout = "obstacle_layout_stage4"
         self.obstacles = obstacle_layouts.get(layout)
-        self.neutrality_matrix = [[0, 0, 0], [0, 0, 0], [0, 0, 0]]
+        self.reset_neutrality(NUM_PLAYERS)
+
+    @property
+    def obstacles(self) -> list[tuple[int, int]]:
+        return self._obstacles
+
+    @obstacles.setter
+    def obstacles(self, obstacles: list[tuple[int, int]]):
+        """
+        Changing the obstacle layout also switches to the board index of that layout. Rule checks
+        read the static tiles (capture area, stations, catapults) from its tile flags.
+        """
+        self._obstacles = obstacles
+        self.rebind_board()
+
+    # The other static tiles are tuples, so they can only change through their setters,
+    # which switch to the board index with the new tiles like the obstacles setter
+    @property
+    def capture_area(self) -> tuple[tuple[int, int], ...]:
+        return self._capture_area
+
+    @capture_area.setter
+    def capture_area(self, tiles):
+        self._capture_area = tuple(tiles)
+        self.rebind_board()
+
+    @property
+    def light_repair_stations(self) -> tuple[tuple[int, int], ...]:
+        return self._light_repair_stations
+
+    @light_repair_stations.setter
+    def light_repair_stations(self, tiles):
+        self._light_repair_stations = tuple(tiles)
+        self.rebind_board()
+
+    @property
+    def heavy_repair_stations(self) -> tuple[tuple[int, int], ...]:
+        return self._heavy_repair_stations
+
+    @heavy_repair_stations.setter
+    def heavy_repair_stations(self, tiles):
+        self._heavy_repair_stations = tuple(tiles)
+        self.rebind_board()
+
+    @property
+    def catapults(self) -> tuple[tuple[int, int], ...]:
+        return self._catapults
+
+    @catapults.setter
+    def catapults(self, tiles):
+        self._catapults = tuple(tiles)
+        self.rebind_board()
+
+    def rebind_board(self):
+        """Switch to the board index of the current obstacles and static tiles."""
+        self.board = get_board_index(
+            self.map_radius,
+            self._obstacles,
+            self._capture_area,
+            self._light_repair_stations,
+            self._heavy_repair_stations,
+            self._catapults,
+        )
+        for vehicle in self.vehicles:
+            vehicle.board = self.board
+        self.invalidate_threat_map()
+        self.capture_distance_fields = {}
 
     def setup(self):
         if self.use_gui:
-            self.gui = Gui(
-                self.hex_size,
-                self.map_radius,
-                self.vehicles,
-                self.obstacles,
-                self.capture_area,
-                self.light_repair_stations,
-                self.heavy_repair_stations,
-                self.catapults,
-            )
+            self.gui = self.get_gui()
+
+    def get_gui(self, offscreen=False):
+        """
+        Get the Gui drawing this game. The window (or offscreen surface) is shared with earlier
+        games, only the state to draw changes.
+        """
+        # Imported here so headless games never load pygame
+        from gui import get_gui
+
+        return get_gui(
+            self.hex_size, self.map_radius, self.vehicles, self.board, offscreen
+        )
 
     def make_game_action(self, action: int = 0) -> int:
         """Make a game action for the current player and tank index. Return reward gained from the action."""
@@ -73,9 +163,7 @@ class Game:
 
         # If first tank action of player, reset their row in neutrality matrix of what they attacked.
         if self.current_tank_index == 0:
-            self.neutrality_matrix[self.current_index] = [0] * len(
-                self.neutrality_matrix[self.current_index]
-            )
+            self.reset_attacks(self.current_index)
 
         self.action_result, reward_gained_from_action = self.players[
             self.current_index
@@ -95,7 +183,7 @@ class Game:
             # Respawn vehicles
             for vehicle in self.vehicles:
                 if vehicle.hp <= 0:
-                    vehicle.position = vehicle.spawn_position
+                    self.set_vehicle_position(vehicle, vehicle.spawn_position)
                     vehicle.hp = vehicle.spawn_hp
             # Check if end of round, last player did their last turn
             if self.current_index + 1 == len(self.players):
@@ -144,6 +232,16 @@ class Game:
                 return -REWARD_FOR_WIN
         return reward
 
+    def capture_winner(self, winners_indexes: list[int]) -> int:
+        """
+        Winner among the players that reached the capture points to win in the same round:
+        the one with the most kill points, the later player wins ties.
+        """
+        return max(
+            reversed(winners_indexes),
+            key=lambda index: self.players[index].kill_points,
+        )
+
     def end_of_round(self) -> int:
         """End of round, award points and check if game is over"""
         total_reward = 0
@@ -151,28 +249,10 @@ class Game:
 
         winners_indexes = self.check_win(self.players)
 
-        # If more than one winner
-        if len(winners_indexes) > 1:
-            print(f"Laimejo {winners_indexes}")
-            self.done = True
-            if (
-                self.players[winners_indexes[0]].kill_points
-                > self.players[winners_indexes[1]].kill_points
-            ):
-                if winners_indexes[0] == self.rl_player_index:
-                    return REWARD_FOR_WIN
-                else:
-                    return -REWARD_FOR_WIN
-            else:
-                if winners_indexes[1] == self.rl_player_index:
-                    return REWARD_FOR_WIN
-                else:
-                    return -REWARD_FOR_WIN
-
-        elif len(winners_indexes) > 0:
+        if len(winners_indexes) > 0:
             print(f"Laimejo {winners_indexes}")
             self.done = True
-            if winners_indexes[0] == self.rl_player_index:
+            if self.capture_winner(winners_indexes) == self.rl_player_index:
                 return REWARD_FOR_WIN
             else:
                 return -REWARD_FOR_WIN
@@ -181,152 +261,469 @@ class Game:
 
     def add_vehicle(self, vehicle: Vehicle):
         """Add vehicle to the game."""
+        vehicle.board = self.board
+        if vehicle.store is not self.vehicle_store:
+            vehicle.move_to_store(self.vehicle_store)
         self.vehicles.append(vehicle)
+        self.add_to_vehicle_map(vehicle)
+        self.invalidate_threat_map()
+
+    def add_to_vehicle_map(self, vehicle: Vehicle):
+        vehicles_at_position = self.vehicle_map.get(vehicle.position)
+        if vehicles_at_position is None:
+            self.vehicle_map[vehicle.position] = [vehicle]
+            if self.capture_distance_fields:
+                self.block_capture_distance_tiles([vehicle.position], self.vehicle_map)
+        else:
+            # Respawning can stack vehicles, keep them in the same order as `self.vehicles`
+            # (store slots are allocated in that order)
+            vehicles_at_position.append(vehicle)
+            vehicles_at_position.sort(key=lambda vehicle: vehicle.slot)
+
+    def remove_from_vehicle_map(self, vehicle: Vehicle):
+        vehicles_at_position = self.vehicle_map[vehicle.position]
+        vehicles_at_position.remove(vehicle)
+        if not vehicles_at_position:
+            del self.vehicle_map[vehicle.position]
+            if self.capture_distance_fields:
+                self.free_capture_distance_tiles([vehicle.position], self.vehicle_map)
+
+    def set_vehicle_position(self, vehicle: Vehicle, position: tuple[int, int]):
+        """Change vehicle position and keep the vehicle map in sync."""
+        self.remove_from_vehicle_map(vehicle)
+        vehicle.position = position
+        self.add_to_vehicle_map(vehicle)
+        self.invalidate_threat_map()
+
+    def reset_neutrality(self, num_players: int):
+        """Neutrality matrix of a new game: nobody attacked anyone."""
+        self.neutrality_matrix = [[0] * num_players for _ in range(num_players)]
+        self.sync_attack_masks()
+
+    def sync_attack_masks(self):
+        """
+        Rebuild the bitmasks kept next to the neutrality matrix, after it was replaced:
+        attacked_by[p] has bit a set when player a attacked player p (column p of the matrix),
+        may_attack[a] has bit p set when player a may shoot at player p's vehicles.
+        Writes to the matrix go through `set_attacked` and `reset_attacks` to keep them in sync.
+        """
+        matrix = self.neutrality_matrix
+        players = range(len(matrix))
+        self.attacked_by = [
+            sum(matrix[attacker][target] << attacker for attacker in players)
+            for target in players
+        ]
+        self.may_attack = [0] * len(players)
+        self.update_may_attack(players)
+
+    def update_may_attack(self, targets):
+        """
+        Refresh the may_attack bits of targets. A player may attack a target that attacked it,
+        or any target nobody attacked, but never itself.
+        """
+        for target in targets:
+            bit = 1 << target
+            not_attacked = self.attacked_by[target] == 0
+            for attacker, attacker_attacked_by in enumerate(self.attacked_by):
+                if attacker != target and (not_attacked or attacker_attacked_by & bit):
+                    self.may_attack[attacker] |= bit
+                else:
+                    self.may_attack[attacker] &= ~bit
+
+    def set_attacked(self, attacker: int, target: int):
+        """Mark in the neutrality matrix that attacker shot at target."""
+        if self.neutrality_matrix[attacker][target] == 1:
+            return
+        self.neutrality_matrix[attacker][target] = 1
+        self.attacked_by[target] |= 1 << attacker
+        self.update_may_attack((target, attacker))
+
+    def reset_attacks(self, attacker: int):
+        """Clear the row of attacker in the neutrality matrix, at the start of its turn."""
+        row = self.neutrality_matrix[attacker]
+        targets = [target for target, attacked in enumerate(row) if attacked]
+        if not targets:
+            return
+        row[:] = [0] * len(row)
+        for target in targets:
+            self.attacked_by[target] &= ~(1 << attacker)
+        self.update_may_attack(targets + [attacker])
+
+    def invalidate_threat_map(self):
+        self.threat_map = None
+        self.enemy_threats = {}
+
+    def get_threat_map(self) -> list[frozenset[tuple[int, int]]]:
+        """Tiles each player's vehicles can shoot at, shared by all bots until a vehicle moves or dies."""
+        if self.threat_map is None:
+            threatened_tiles = [set() for _ in self.players]
+            for vehicle in self.vehicles:
+                if vehicle.type == TANK_DESTROYER:
+                    tiles = self.get_tank_destroyer_shootable_tiles(vehicle.position)
+                else:
+                    tiles = self.get_tiles_in_radius(
+                        vehicle.position, vehicle.shooting_range
+                    )
+                threatened_tiles[vehicle.owning_player.index].update(tiles)
+            self.threat_map = [frozenset(tiles) for tiles in threatened_tiles]
+        return self.threat_map
+
+    def get_enemy_threat(self, player_index: int) -> frozenset[tuple[int, int]]:
+        """Tiles threatened by any player other than player_index."""
+        threat = self.enemy_threats.get(player_index)
+        if threat is None:
+            threat = frozenset().union(
+                *(
+                    tiles
+                    for index, tiles in enumerate(self.get_threat_map())
+                    if index != player_index
+                )
+            )
+            self.enemy_threats[player_index] = threat
+        return threat
+
+    def get_capture_distance_field(
+        self, speed_points: int, ignore_vehicles: bool = False
+    ) -> dict[tuple[int, int], int]:
+        """
+        Move actions a vehicle with speed_points needs to reach the capture area, for every tile
+        it can reach it from over the current obstacles and vehicles: moves may pass other
+        vehicles but not end on them, occupied capture tiles still count as goals. Tiles missing
+        from the field can't reach the capture area.
+        With ignore_vehicles moves may end on any tile, that field is shared by the board index.
+        The field with vehicles starts from it and is repaired around the tiles whose occupancy
+        changes, see `block_capture_distance_tiles` and `free_capture_distance_tiles`.
+        """
+        if ignore_vehicles:
+            return self.board.capture_distance_field(speed_points)
+        field = self.capture_distance_fields.get(speed_points)
+        if field is None:
+            field = dict(self.board.capture_distance_field(speed_points))
+            self.capture_distance_fields[speed_points] = field
+            self.block_capture_distance_tiles(
+                self.vehicle_map, self.vehicle_map, [speed_points]
+            )
+        return field
+
+    def block_capture_distance_tiles(self, tiles, occupied, speed_points=None):
+        """
+        Repair the capture distance fields after moves stopped ending on tiles (occupied, the
+        tiles occupied now, contains them). Only tiles whose every shortest way went over them
+        are searched again, from the tiles around them that kept their distance.
+        """
+        goals = self.board.capture_goals
+        if speed_points is None:
+            speed_points = list(self.capture_distance_fields)
+        for sp in speed_points:
+            field = self.capture_distance_fields[sp]
+            move_sources = self.board.move_sources(sp)
+            move_targets = self.board.move_targets(sp)
+            # Tiles that may have lost their last neighbor one move closer
+            stack = []
+            for tile in tiles:
+                distance = field.get(tile)
+                if distance is not None and tile not in goals:
+                    stack.extend(
+                        source
+                        for source in move_sources[tile]
+                        if field.get(source) == distance + 1
+                    )
+            removed = set()
+            while stack:
+                tile = stack.pop()
+                distance = field.get(tile)
+                if distance is None:
+                    continue
+                for target in move_targets[tile]:
+                    if field.get(target) == distance - 1 and (
+                        target not in occupied or target in goals
+                    ):
+                        break
+                else:
+                    del field[tile]
+                    removed.add(tile)
+                    if tile not in occupied:
+                        stack.extend(
+                            source
+                            for source in move_sources[tile]
+                            if field.get(source) == distance + 1
+                        )
+            # Search the removed tiles again, starting from the distances that are left
+            heap = []
+            for tile in removed:
+                distances = [
+                    field[target]
+                    for target in move_targets[tile]
+                    if target in field and (target not in occupied or target in goals)
+                ]
+                if distances:
+                    heap.append((min(distances) + 1, tile))
+            heapq.heapify(heap)
+            while heap:
+                distance, tile = heapq.heappop(heap)
+                if tile in field:
+                    continue
+                field[tile] = distance
+                if tile not in occupied:
+                    for source in move_sources[tile]:
+                        if source in removed and source not in field:
+                            heapq.heappush(heap, (distance + 1, source))
+
+    def free_capture_distance_tiles(self, tiles, occupied):
+        """
+        Repair the capture distance fields after moves can end on tiles again (occupied, the
+        tiles occupied now, no longer contains them): distances only get shorter, spreading out
+        from the freed tiles.
+        """
+        goals = self.board.capture_goals
+        for sp, field in self.capture_distance_fields.items():
+            move_sources = self.board.move_sources(sp)
+            heap = [(field[tile], tile) for tile in tiles if tile in field]
+            heapq.heapify(heap)
+            while heap:
+                distance, tile = heapq.heappop(heap)
+                if field[tile] != distance:
+                    continue
+                for source in move_sources[tile]:
+                    if field.get(source, distance + 2) > distance + 1:
+                        field[source] = distance + 1
+                        if source not in occupied or source in goals:
+                            heapq.heappush(heap, (distance + 1, source))
+
+    def find_next_move_to_capture_area(
+        self, vehicle: Vehicle, hexes_to_avoid=(), ignore_vehicles: bool = False
+    ) -> tuple[int, int] | None:
+        """
+        Next tile towards the capture area: the reachable tile with the lowest capture distance.
+        Tiles in hexes_to_avoid and occupied tiles are never chosen, so when the closer tiles are
+        avoided the move dodges sideways or even backwards, like a detour around them.
+        Returns None if vehicle is already in the capture area or no tile it can move to reaches it.
+        ignore_vehicles steps down the field that ignores other vehicles (cheap, it is never rebuilt).
+        """
+        if self.in_capture_area(vehicle.position):
+            return None
+        field = self.get_capture_distance_field(vehicle.sp, ignore_vehicles)
+        best_move = None
+        best_distance = None
+        for tile in self.board.reach(vehicle.position, vehicle.sp):
+            if tile in self.vehicle_map or tile in hexes_to_avoid:
+                continue
+            distance = field.get(tile)
+            if distance is not None and (best_distance is None or distance < best_distance):
+                best_move = tile
+                best_distance = distance
+        return best_move
+
+    def get_capture_distances(self) -> list[int]:
+        """Capture distance field value of every vehicle (in `self.vehicles` order), -1 if unreachable."""
+        return [
+            self.get_capture_distance_field(vehicle.sp).get(vehicle.position, -1)
+            for vehicle in self.vehicles
+        ]
+
+    def get_vehicle_at(self, position: tuple[int, int]) -> Vehicle | None:
+        vehicles_at_position = self.vehicle_map.get(position)
+        if vehicles_at_position is None:
+            return None
+        return vehicles_at_position[0]
+
+    def get_state_key(self) -> tuple:
+        """
+        Hashable key of everything the scripted bots plan from: the board, vehicle positions, hp,
+        owners, types and range bonuses, the neutrality matrix and each player's capture points.
+        """
+        store = self.vehicle_store
+        size = store.size
+        return (
+            self.board,
+            np.concatenate((store.q[:size], store.r[:size], store.hp[:size])).tobytes(),
+            np.concatenate(
+                (store.owner[:size], store.type[:size], store.range_bonus[:size])
+            ).tobytes(),
+            tuple(self.attacked_by),  # Same information as the neutrality matrix
+            tuple(store.capture_points_by_owner(len(self.players))),
+        )
+
+    # Snapshot and restore the game state
+    def snapshot(self) -> tuple:
+        """
+        Capture the mutable game state (vehicles, players, turn order, neutrality and catapult
+        history) in a flat tuple for `restore`. Static data (board, stations, Player and Vehicle
+        objects) is shared, GUI only fields are not captured.
+        """
+        return (
+            self.vehicle_store.get_state(),
+            {
+                position: tuple(vehicles)
+                for position, vehicles in self.vehicle_map.items()
+            },
+            tuple(vehicle.reserved_move for vehicle in self.vehicles),
+            tuple(
+                (player.kill_points, player.capture_points) for player in self.players
+            ),
+            tuple(tuple(row) for row in self.neutrality_matrix),
+            tuple(self.catapult_usage_history),
+            self.num_turns,
+            self.current_index,
+            self.current_tank_index,
+            self.done,
+        )
+
+    def restore(self, snapshot: tuple):
+        """Return to the state of a `snapshot` of this game, a snapshot can be restored many times."""
+        (
+            store_state,
+            vehicle_map,
+            reserved_moves,
+            player_points,
+            neutrality_matrix,
+            catapult_usage_history,
+            self.num_turns,
+            self.current_index,
+            self.current_tank_index,
+            self.done,
+        ) = snapshot
+        self.vehicle_store.set_state(store_state)
+        old_vehicle_map = self.vehicle_map
+        self.vehicle_map = {
+            position: list(vehicles) for position, vehicles in vehicle_map.items()
+        }
+        if self.capture_distance_fields:
+            # Block the newly occupied tiles while the freed ones are still blocked, then free them
+            self.block_capture_distance_tiles(
+                vehicle_map.keys() - old_vehicle_map.keys(),
+                vehicle_map.keys() | old_vehicle_map.keys(),
+            )
+            self.free_capture_distance_tiles(
+                old_vehicle_map.keys() - vehicle_map.keys(), self.vehicle_map
+            )
+        for vehicle, reserved_move in zip(self.vehicles, reserved_moves):
+            vehicle.reserved_move = reserved_move
+        for player, (kill_points, capture_points) in zip(self.players, player_points):
+            player.kill_points = kill_points
+            player.capture_points = capture_points
+        self.neutrality_matrix = [list(row) for row in neutrality_matrix]
+        self.sync_attack_masks()
+        self.catapult_usage_history = list(catapult_usage_history)
+        self.invalidate_threat_map()
 
     # Place and add vehicles
+    def get_spawn_tiles(
+        self, num_players: int, squad_size: int
+    ) -> list[list[tuple[int, int]]]:
+        """Spawn tiles of each player, squad_size tiles in the middle of its edge in board order."""
+        offset = (self.map_radius + 1 - squad_size) // 2
+        spawn_tiles = []
+        for player in range(num_players):
+            edge = [
+                tile
+                for tile in self.board.tiles
+                if self.board.tile_flags[tile] & (SPAWN_EDGE << player)
+            ]
+            spawn_tiles.append(edge[offset : offset + squad_size])
+        return spawn_tiles
+
     def place_vehicles(self, players: list["Player"]):
-        """Place vehicles on the map for each player."""
-        rounded_amount_from_edge = round((self.map_radius + 1 - 5) / 2)
-        firstVehicleIndex = 0
-        secondVehicleIndex = 0
-        thirdVehicleIndex = 0
-        for q in range(-self.map_radius, self.map_radius + 1):
-            r1 = max(-self.map_radius, -q - self.map_radius)
-            r2 = min(self.map_radius, -q + self.map_radius)
-            for r in range(r1, r2 + 1):
-                # Place and add vehicle for Player1
-                if (
-                    self.map_radius - rounded_amount_from_edge
-                    >= (-r)
-                    >= rounded_amount_from_edge
-                    and q == self.map_radius
-                ):
-                    if firstVehicleIndex == 0:
-                        vehicle_to_add = Spg(players[0], (q, r), firstVehicleIndex)
-                    elif firstVehicleIndex == 1:
-                        vehicle_to_add = Light_Tank(
-                            players[0], (q, r), firstVehicleIndex
-                        )
-                    elif firstVehicleIndex == 2:
-                        vehicle_to_add = Heavy_Tank(
-                            players[0], (q, r), firstVehicleIndex
-                        )
-                    elif firstVehicleIndex == 3:
-                        vehicle_to_add = Medium_Tank(
-                            players[0], (q, r), firstVehicleIndex
-                        )
-                    elif firstVehicleIndex == 4:
-                        vehicle_to_add = Tank_Destroyer(
-                            players[0], (q, r), firstVehicleIndex
-                        )
-                    players[0].vehicles.append(vehicle_to_add)
-                    self.add_vehicle(vehicle_to_add)
-                    firstVehicleIndex += 1
-                # Place and add vehicle for Player2
-                elif (
-                    self.map_radius - rounded_amount_from_edge
-                    >= -q
-                    >= rounded_amount_from_edge
-                    and self.map_radius - rounded_amount_from_edge
-                    >= -r
-                    >= rounded_amount_from_edge
-                    and q + r == -self.map_radius
-                ):
-                    if secondVehicleIndex == 0:
-                        vehicle_to_add = Spg(players[1], (q, r), secondVehicleIndex)
-                    elif secondVehicleIndex == 1:
-                        vehicle_to_add = Light_Tank(
-                            players[1], (q, r), secondVehicleIndex
-                        )
-                    elif secondVehicleIndex == 2:
-                        vehicle_to_add = Heavy_Tank(
-                            players[1], (q, r), secondVehicleIndex
-                        )
-                    elif secondVehicleIndex == 3:
-                        vehicle_to_add = Medium_Tank(
-                            players[1], (q, r), secondVehicleIndex
-                        )
-                    elif secondVehicleIndex == 4:
-                        vehicle_to_add = Tank_Destroyer(
-                            players[1], (q, r), secondVehicleIndex
-                        )
-                    players[1].vehicles.append(vehicle_to_add)
-                    self.add_vehicle(vehicle_to_add)
-                    secondVehicleIndex += 1
-                # Place and add vehicle for Player3
-                elif (
-                    r == self.map_radius
-                    and self.map_radius - rounded_amount_from_edge
-                    >= -q
-                    >= rounded_amount_from_edge
-                ):
-                    if thirdVehicleIndex == 0:
-                        vehicle_to_add = Spg(players[2], (q, r), thirdVehicleIndex)
-                    elif thirdVehicleIndex == 1:
-                        vehicle_to_add = Light_Tank(
-                            players[2], (q, r), thirdVehicleIndex
-                        )
-                    elif thirdVehicleIndex == 2:
-                        vehicle_to_add = Heavy_Tank(
-                            players[2], (q, r), thirdVehicleIndex
-                        )
-                    elif thirdVehicleIndex == 3:
-                        vehicle_to_add = Medium_Tank(
-                            players[2], (q, r), thirdVehicleIndex
-                        )
-                    elif thirdVehicleIndex == 4:
-                        vehicle_to_add = Tank_Destroyer(
-                            players[2], (q, r), thirdVehicleIndex
-                        )
-                    players[2].vehicles.append(vehicle_to_add)
-                    self.add_vehicle(vehicle_to_add)
-                    thirdVehicleIndex += 1
+        """Place a vehicle of every squad type for each player on its spawn edge."""
+        if not 1 <= len(players) <= len(SPAWN_EDGES):
+            raise ValueError(
+                f"Games have 1 to {len(SPAWN_EDGES)} players, not {len(players)}"
+            )
+        if len(self.squad) > self.map_radius + 1:
+            raise ValueError(
+                f"Squad of {len(self.squad)} vehicles is longer than a map edge"
+            )
+        spawn_owners = {}
+        for player, tiles in zip(
+            players, self.get_spawn_tiles(len(players), len(self.squad))
+        ):
+            for tile in tiles:
+                if tile in spawn_owners:
+                    raise ValueError(
+                        f"Spawn tile {tile} is on the edges of two players"
+                    )
+                spawn_owners[tile] = player
+        self.reset_neutrality(len(players))
+        self.max_turns = MAX_ROUNDS * len(players)
+
+        # Vehicles are added in board order, a player's vehicle index follows the same order
+        for tile in self.board.tiles:
+            player = spawn_owners.get(tile)
+            if player is None:
+                continue
+            vehicle_index = len(player.vehicles)
+            vehicle_to_add = VEHICLE_CLASSES[self.squad[vehicle_index]](
+                player, tile, vehicle_index, self.vehicle_store
+            )
+            player.vehicles.append(vehicle_to_add)
+            self.add_vehicle(vehicle_to_add)
 
     def check_collision(self, new_position: tuple[int, int]) -> bool:
         """Check if collision occurs in new position."""
-        for vehicle in self.vehicles:
-            if vehicle.position == new_position:
-                print(f"Collision detected in position {new_position}")
-                return True  # Collision detected
-        if new_position in self.obstacles:
+        if new_position in self.vehicle_map:
+            print(f"Collision detected in position {new_position}")
+            return True  # Collision detected
+        if self.board.tile_flags.get(new_position, 0) & OBSTACLE:
             return True  # Collision detected
         return False  # No collision
 
     def is_move_out_of_bounds(self, new_position):
-        """Check if legal move"""
-        if -10 <= new_position[0] <= 10 and -10 <= new_position[0] <= 10:
-            return True  # Illegal move
-        return False  # Legal move
+        """Check if legal move, True when new_position is on the map"""
+        return bool(self.board.tile_flags.get(new_position, 0) & ON_BOARD)
+
+    def get_action_mask(self, vehicle: Vehicle) -> np.ndarray:
+        """
+        Actions of `ReinforcementLearningPlayer` that do something for vehicle: moves within its
+        speed points to a free tile, and shooting when there is a target.
+        If no action does anything, only the shoot action is allowed.
+        """
+        mask = np.zeros(len(ACTION_DIRECTIONS) + 1, dtype=bool)
+        q, r = vehicle.position
+        for action, direction in enumerate(ACTION_DIRECTIONS):
+            if ACTION_SPEED_POINTS[action] > vehicle.sp:
+                break
+            new_position = (q + direction[0], r + direction[1])
+            mask[action] = (
+                new_position not in self.vehicle_map
+                and self.board.tile_flags.get(new_position, 0) & (ON_BOARD | OBSTACLE)
+                == ON_BOARD
+            )
+        has_target = (
+            len(
+                vehicle.get_shootable_vehicles(
+                    self.obstacles, self.vehicle_map, self.may_attack
+                )
+            )
+            > 0
+        )
+        mask[SHOOT_ACTION] = has_target or not mask.any()
+        return mask
 
     def move_vehicle(self, vehicle: Vehicle, new_position: tuple[int, int]) -> bool:
         """Move the vehicle to the new position if no collision occurs."""
         if not self.check_collision(new_position) and self.is_move_out_of_bounds(
             new_position
         ):
-            vehicle.position = new_position
-            if new_position in self.catapults:
+            self.set_vehicle_position(vehicle, new_position)
+            tile_flags = self.board.tile_flags[new_position]
+            if tile_flags & CATAPULT:
                 vehicle.shooting_range_bonus = True
-            if new_position in self.heavy_repair_stations and (
+            if tile_flags & HEAVY_REPAIR and (
                 vehicle.type == HEAVY_TANK or vehicle.type == TANK_DESTROYER
             ):
                 vehicle.hp = vehicle.spawn_hp
-            if (
-                new_position in self.light_repair_stations
-                and vehicle.type == MEDIUM_TANK
-            ):
+            if tile_flags & LIGHT_REPAIR and vehicle.type == MEDIUM_TANK:
                 vehicle.hp = vehicle.spawn_hp
             return True  # Move successful
         return False  # Collision occurred, unable to move
 
     def check_win(self, players: list["Player"]) -> list[int]:
-        lst = [0, 0, 0]
+        lst = self.vehicle_store.capture_points_by_owner(len(players))
         winners = []
-        for vehicle in self.vehicles:
-            lst[vehicle.owning_player.index] += vehicle.capture_points
         for player, points in zip(players, lst):
             player.capture_points = points
         for index, element in enumerate(lst):
-            if element >= 5:  # capture points to win
+            if element >= CAPTURE_POINTS_TO_WIN:
                 winners.append(index)
         return winners
 
@@ -338,70 +735,61 @@ class Game:
                 vehicle, shooting_target
             )
             for hit_vehicle in hit_vehicles:
-                self.neutrality_matrix[vehicle.owning_player.index][
-                    hit_vehicle.owning_player.index
-                ] = 1
+                self.set_attacked(
+                    vehicle.owning_player.index, hit_vehicle.owning_player.index
+                )
                 hit_vehicle.hp -= vehicle.damage
                 if vehicle.owning_player.index == self.rl_player_index:
                     reward_gained += REWARD_FOR_SUCCESSFULL_SHOT
                 if hit_vehicle.hp <= 0:
+                    self.invalidate_threat_map()
                     if vehicle.owning_player.index == self.rl_player_index:
                         reward_gained = REWARD_FOR_SHOT_DESTROYING_TANK
                     vehicle.owning_player.kill_points += hit_vehicle.destruction_points
-            if vehicle.position not in self.catapults:
+            if not self.board.tile_flags.get(vehicle.position, 0) & CATAPULT:
                 vehicle.shooting_range_bonus = False
             else:
                 self.catapult_usage_history.append(vehicle.position)
             return reward_gained
         else:
-            for target_vehicle in self.vehicles:
-                if target_vehicle.position == shooting_target:
-                    self.neutrality_matrix[vehicle.owning_player.index][
-                        target_vehicle.owning_player.index
-                    ] = 1
+            target_vehicle = self.get_vehicle_at(shooting_target)
+            if target_vehicle is None:
+                return reward_gained
 
-                    target_vehicle.hp -= vehicle.damage
-                    if vehicle.owning_player.index == self.rl_player_index:
-                        reward_gained = REWARD_FOR_SUCCESSFULL_SHOT
-
-                    # if enemy tank destroyed, give points
-                    if target_vehicle.hp <= 0:
-                        if vehicle.owning_player.index == self.rl_player_index:
-                            reward_gained = REWARD_FOR_SHOT_DESTROYING_TANK
-                        vehicle.owning_player.kill_points += (
-                            target_vehicle.destruction_points
-                        )
-                    if vehicle.position not in self.catapults:
-                        vehicle.shooting_range_bonus = False
-                    else:
-                        self.catapult_usage_history.append(vehicle.position)
-                    return reward_gained
+            self.set_attacked(
+                vehicle.owning_player.index, target_vehicle.owning_player.index
+            )
+
+            target_vehicle.hp -= vehicle.damage
+            if vehicle.owning_player.index == self.rl_player_index:
+                reward_gained = REWARD_FOR_SUCCESSFULL_SHOT
+
+            # if enemy tank destroyed, give points
+            if target_vehicle.hp <= 0:
+                self.invalidate_threat_map()
+                if vehicle.owning_player.index == self.rl_player_index:
+                    reward_gained = REWARD_FOR_SHOT_DESTROYING_TANK
+                vehicle.owning_player.kill_points += (
+                    target_vehicle.destruction_points
+                )
+            if not self.board.tile_flags.get(vehicle.position, 0) & CATAPULT:
+                vehicle.shooting_range_bonus = False
+            else:
+                self.catapult_usage_history.append(vehicle.position)
+            return reward_gained
 
     def get_tank_destroyer_shot_vehicles(
         self, vehicle: Vehicle, shooting_target
     ) -> list[Vehicle]:
         """Get vehicles that are shot by tank destroyer."""
+        targets = self.may_attack[vehicle.owning_player.index]
         shot_vehicles = []
-        shootable_hexes_by_direction_vector = vehicle.get_shootable_hexes()
-
-        for one_direction_shootable_hexes in shootable_hexes_by_direction_vector:
-            if one_direction_shootable_hexes[0] == shooting_target:
-                vehicles_in_direction = []
-                for hexagon in one_direction_shootable_hexes:
-                    if hexagon in self.obstacles:
-                        break
-                    else:
-                        for enemy_vehicle in self.vehicles:
-                            if (
-                                enemy_vehicle.position == hexagon
-                                and enemy_vehicle.owning_player != vehicle.owning_player
-                                and check_neutrality(
-                                    vehicle.owning_player.index,
-                                    enemy_vehicle.owning_player.index,
-                                    self.neutrality_matrix,
-                                )
-                            ):
-                                shot_vehicles.append(enemy_vehicle)
+        for entry_hex, hexes in vehicle.get_attack_template():
+            if entry_hex == shooting_target:
+                for hexagon in hexes:
+                    for enemy_vehicle in self.vehicle_map.get(hexagon, ()):
+                        if targets >> enemy_vehicle.owning_player.index & 1:
+                            shot_vehicles.append(enemy_vehicle)
         return shot_vehicles
 
     def find_path_single_goal(
@@ -487,7 +875,7 @@ class Game:
         position: tuple[int, int],
         vehicle: Vehicle,
         goals: list[tuple[int, int]],
-        vehicle_map: dict[tuple[int, int], Vehicle],
+        vehicle_map: dict[tuple[int, int], list[Vehicle]],
         map_size: int,
         hexes_to_avoid: list[tuple[int, int]] | None = None,
         max_iterations: int = 500,
@@ -498,6 +886,7 @@ class Game:
         """
 
         vehicle_position = position
+        goals = frozenset(goals)
         if vehicle_position in goals:
             return None  # Vehicle is already at goal
         speed_points = vehicle.sp
@@ -539,7 +928,7 @@ class Game:
         self,
         vehicle: Vehicle,
         goals: list[tuple[int, int]],
-        vehicle_map: dict[tuple[int, int], Vehicle],
+        vehicle_map: dict[tuple[int, int], list[Vehicle]],
         map_size: int,
         hexes_to_avoid: list[tuple[int, int]] | None = None,
         max_iterations: int = 500,
@@ -549,6 +938,7 @@ class Game:
         For testing purposes whole shortest path is returned.
         """
         vehicle_position = vehicle.position
+        goals = frozenset(goals)
         if vehicle_position in goals:
             return None  # Vehicle is already at goal
 
@@ -591,23 +981,14 @@ class Game:
 
     def get_valid_immediate_neighbors(
         self, position: tuple[int, int]
-    ) -> list[tuple[int, int]]:
-        """Get list of valid neighbors next to position coordinate (neighbors that are not OBSTACLES)!!!"""
-        neighbors = []
-        for direction in self.get_tiles_in_radius_true((0, 0), 1):
-            neighbors.append((position[0] + direction[0], position[1] + direction[1]))
-        res = []
-
-        # Remove obstacles
-        for neighbor in neighbors:
-            if neighbor not in self.obstacles:
-                res.append(neighbor)
-        return res
+    ) -> tuple[tuple[int, int], ...]:
+        """Get valid neighbors next to position coordinate (neighbors that are not OBSTACLES)!!!"""
+        return self.board.valid_immediate_neighbors(position)
 
     def get_neighbors(
         self,
         position: tuple[int, int],
-        vehicle_map: dict[tuple[int, int], Vehicle],
+        vehicle_map: dict[tuple[int, int], list[Vehicle]],
         speed_points: int,
         map_size: int,
     ):
@@ -617,45 +998,20 @@ class Game:
         Returns and array of neighbors that vehicle can reach in one MoveAction.
         There are no coordinates that are occupied by another vehicle and obstacle.
 
-        Algorithm uses BFS to find neighbors.
+        Reachable hexes come from the board's precomputed move table, vehicles only mask the result
+        (they never block the way, so no search is needed).
         """
-
-        neighbors_heap = []
-        heapq.heappush(neighbors_heap, (0, position))
-
-        visited = set()  # Set of visited hex coordinates
-        visited.add(position)
-
-        max_dist = speed_points
-        res = []
-        while neighbors_heap:
-            neighbor = heapq.heappop(neighbors_heap)
-            if vehicle_map.get(neighbor[1]) is None:
-                res.append(neighbor[1])  # Not occupied by vehicle
-
-            if neighbor[0] == max_dist:
-                continue  # Neighbors of this hexagon can't be reached with this tank's speed points
-
-            current_neighbors = self.get_valid_immediate_neighbors(neighbor[1])
-            for coordinate in current_neighbors:
-                # Remove coordinates that are outside map
-                if (
-                    coordinate in visited
-                    or coordinate[0] <= -map_size
-                    or coordinate[0] >= map_size
-                    or coordinate[1] <= -map_size
-                    or coordinate[1] >= map_size
-                ):
-                    continue
-                visited.add(coordinate)
-                heapq.heappush(neighbors_heap, (neighbor[0] + 1, coordinate))
-        return res
+        return [
+            hexagon
+            for hexagon in self.board.bounded_reach(position, speed_points, map_size)
+            if vehicle_map.get(hexagon) is None
+        ]
 
     def get_neighbors_ignore_goals(
         self,
         starting_vehicle_position: tuple[int, int],
         position: tuple[int, int],
-        vehicle_map: dict[tuple[int, int], Vehicle],
+        vehicle_map: dict[tuple[int, int], list[Vehicle]],
         goals: list[tuple[int, int]],
         speed_points: int,
         map_size: int,
@@ -664,71 +1020,50 @@ class Game:
         Get neighbor hexes based on vehicle speed. Only valid neighbors are returned.
 
         Returns and array of neighbors that vehicle can reach in one MoveAction.
-        There are no coordinates that are occupied by another vehicle and obstacle.
+        There are no coordinates that are occupied by another vehicle and obstacle,
+        except goals that the vehicle can't reach in its first move.
 
-        Algorithm uses BFS to find neighbors.
+        Reachable hexes come from the board's precomputed move table, vehicles only mask the result.
         """
-        immediate_movement_hexes = cube_spiral(starting_vehicle_position, speed_points)
-        neighbors_heap = []
-        heapq.heappush(neighbors_heap, (0, position))
-
-        visited = set()  # Set of visited hex coordinates
-        visited.add(position)
-
-        max_dist = speed_points
+        immediate_movement_hexes = self.board.spiral(
+            starting_vehicle_position, speed_points
+        )
         res = []
-        while neighbors_heap:
-            neighbor = heapq.heappop(neighbors_heap)
-            if vehicle_map.get(neighbor[1]) is None:
-                res.append(neighbor[1])  # Not occupied by vehicle
+        for hexagon in self.board.bounded_reach(position, speed_points, map_size):
+            if vehicle_map.get(hexagon) is None:
+                res.append(hexagon)  # Not occupied by vehicle
             # If occupied but it's the goal, add it to neighbors
-            elif neighbor[1] in goals and (neighbor[1] not in immediate_movement_hexes):
-                res.append(neighbor[1])
-            if neighbor[0] == max_dist:
-                continue  # Neighbors of this hexagon can't be reached with this tank's speed points
-
-            current_neighbors = self.get_valid_immediate_neighbors(neighbor[1])
-            for coordinate in current_neighbors:
-                # Remove coordinates that are outside map
-                if (
-                    coordinate in visited
-                    or coordinate[0] <= -map_size
-                    or coordinate[0] >= map_size
-                    or coordinate[1] <= -map_size
-                    or coordinate[1] >= map_size
-                ):
-                    continue
-                visited.add(coordinate)
-                heapq.heappush(neighbors_heap, (neighbor[0] + 1, coordinate))
+            elif hexagon in goals and (hexagon not in immediate_movement_hexes):
+                res.append(hexagon)
         return res
 
+    def in_capture_area(self, position: tuple[int, int]) -> bool:
+        return bool(self.board.tile_flags.get(position, 0) & CAPTURE_AREA)
+
     def hex_distance(self, a: tuple[int, int], b: tuple[int, int]) -> int:
         return (
             abs(a[0] - b[0]) + abs(a[0] + a[1] - b[0] - b[1]) + abs(a[1] - b[1])
         ) // 2
 
     def count_player_vehicles(self, player: "Player") -> int:
-        count = 0
-        for vehicle in self.vehicles:
-            if vehicle.owning_player == player:
-                count += 1
-        return count
+        return len(player.vehicles)
 
     # Award and remove capture points from vehicles
     def award_capture_points(self) -> int:
         reward_gained = 0
         players_in_capture_area = set()
+        tile_flags = self.board.tile_flags
         for vehicle in self.vehicles:
-            if vehicle.position in self.capture_area:
+            if tile_flags.get(vehicle.position, 0) & CAPTURE_AREA:
                 players_in_capture_area.add(vehicle.owning_player.index)
             else:
                 vehicle.capture_points = 0
-        if len(players_in_capture_area) < 3:
+        if len(players_in_capture_area) < len(self.players):
             for vehicle in self.vehicles:
-                if vehicle.position in self.capture_area:
+                if tile_flags.get(vehicle.position, 0) & CAPTURE_AREA:
                     vehicle.capture_points += 1
-                    if vehicle.owning_player.index == 0:
-                        reward_gained += 30
+                    if vehicle.owning_player.index == self.rl_player_index:
+                        reward_gained += REWARD_FOR_CAPTURE
                 else:
                     vehicle.capture_points = 0
         return reward_gained
@@ -736,74 +1071,28 @@ class Game:
     def get_tank_destroyer_shootable_tiles(
         self, center_coords: tuple[int, int]
     ) -> list[tuple[int, int]]:
-        center_q, center_r = center_coords
+        """Tiles a Tank Destroyer at center can hit, each direction stops before an obstacle."""
         tiles = []
-        direction_blocked = False
         for direction in tank_destroyer_shooting_directions:
-            direction_blocked = False
-            for tile in direction:
-                hexagon = (tile[0] + center_q, tile[1] + center_r)
-                if (hexagon) in self.obstacles:
-                    direction_blocked = True
-                    continue
-                elif direction_blocked == False:
-                    tiles.append(hexagon)
+            tiles.extend(self.board.ray(center_coords, direction[0], len(direction)))
         return tiles
 
     def get_tank_destroyer_shot_results(
         self, center_coords: tuple[int, int], shoot_tile: tuple[int, int]
     ) -> list[tuple[int, int]]:
-        center_q, center_r = center_coords
-        tiles = []
-        hit_tiles = []
-        tempdirection = []
+        """Tiles hit by a Tank Destroyer at center shooting in the direction of shoot_tile."""
         for direction in tank_destroyer_shooting_directions:
-            tempdirection = direction
-            found_obstacle = False
-            for tile in direction:
-                hexagon = (tile[0] + center_q, tile[1] + center_r)
-                if hexagon in self.obstacles:
-                    found_obstacle = True
-                if hexagon == shoot_tile and found_obstacle == False:
-                    for shooting in tempdirection:
-                        hexagon = (tile[0] + center_q, tile[1] + center_r)
-                        if hexagon in self.obstacles:
-                            return hit_tiles
-                        hit_tiles.append(hexagon)
-                    return hit_tiles
+            tiles = self.board.ray(center_coords, direction[0], len(direction))
+            if shoot_tile in tiles:
+                return list(tiles)
         return []
 
     def get_tiles_in_radius(
         self, center_coords: tuple[int, int], radius: int
-    ) -> list[tuple[int, int]]:
-        center_q, center_r = center_coords
-        tiles = []
-        bad_tiles = []
-        for dq in range(-radius, radius + 1):
-            for dr in range(max(-radius, -dq - radius), min(radius, -dq + radius) + 1):
-                if abs(dq) + abs(dr) + abs(-dq - dr) <= radius:
-                    bad_tiles.append((center_q + dq, center_r + dr))
-
-        for dq in range(-radius, radius + 1):
-            for dr in range(max(-radius, -dq - radius), min(radius, -dq + radius) + 1):
-                if abs(dq) + abs(dr) + abs(-dq - dr) >= radius:
-                    tiles.append((center_q + dq, center_r + dr))
-        true_tiles = [x for x in tiles if x not in bad_tiles]
-        return true_tiles
+    ) -> tuple[tuple[int, int], ...]:
+        return self.board.tiles_in_radius(center_coords, radius)
 
     def get_tiles_in_radius_true(
         self, center_coords: tuple[int, int], radius: int
-    ) -> list[tuple[int, int]]:
-        center_q, center_r = center_coords
-        tiles = []
-
-        for dq in range(-radius, radius + 1):
-            for dr in range(max(-radius, -dq - radius), min(radius, -dq + radius) + 1):
-                if abs(dq) + abs(dr) + abs(-dq - dr) <= radius:
-                    tiles.append((center_q + dq, center_r + dr))
-
-        for dq in range(-radius, radius + 1):
-            for dr in range(max(-radius, -dq - radius), min(radius, -dq + radius) + 1):
-                if abs(dq) + abs(dr) + abs(-dq - dr) >= radius:
-                    tiles.append((center_q + dq, center_r + dr))
-        return tiles
+    ) -> tuple[tuple[int, int], ...]:
+        return self.board.tiles_in_radius_true(center_coords, radius)
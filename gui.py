@@ -1,6 +1,7 @@
 import pygame
 import math
 import game
+from board import *
 from constants import *
 
 
@@ -10,21 +11,16 @@ class Gui:
         hex_size,
         map_radius,
         vehicles,
-        obstacles,
-        capture_area,
-        light_repair_stations,
-        heavy_repair_stations,
-        catapults,
+        board,
+        offscreen=False,
     ):
         self.hex_size = hex_size
+        self.offscreen = offscreen
         self.map_radius = map_radius
-        self.vehicles = vehicles
-        self.obstacles = obstacles
-        self.capture_area = capture_area
-        self.light_repair_stations = light_repair_stations
-        self.heavy_repair_stations = heavy_repair_stations
-        self.catapults = catapults
+        self.static_layers_key = None
         self.hex_images = {}
+        # (image id, color) -> scaled and tinted image
+        self.tinted_images = {}
         self.screen_width = int(3 / 2 * self.hex_size * (2 * self.map_radius + 1))
         self.screen_height = int(
             math.sqrt(3) * self.hex_size * (2 * self.map_radius + 1)
@@ -32,31 +28,58 @@ class Gui:
         self.center_x = self.screen_width // 2
         self.center_y = self.screen_height // 2
 
-        pygame.init()
-        self.screen = pygame.display.set_mode((1920, 1080))
-        pygame.display.set_caption("Hexagonal Map")
+        if offscreen:
+            # Draw into a plain surface, no window or display is needed
+            pygame.font.init()
+            self.screen = pygame.Surface((1920, 1080))
+        else:
+            pygame.init()
+            self.screen = pygame.display.set_mode((1920, 1080))
+            pygame.display.set_caption("Hexagonal Map")
         self.font = pygame.font.Font(None, 36)
+        self.label_font = pygame.font.Font(None, 20)
         self.screen.fill(WHITE)
         self.load_images()
-        pygame.display.flip()
-        self.load_images()
+        if not offscreen:
+            pygame.display.flip()
+        self.bind_game_state(vehicles, board)
+
+    def bind_game_state(self, vehicles, board):
+        """
+        Draw another game's state, static layers are only rebuilt if its board (the `BoardIndex`
+        with the tile flags) or spawn tiles differ.
+        """
+        self.vehicles = vehicles
+        self.board = board
+        # Spawn tile -> index of the player spawning there, outlined in the player's color
+        self.spawn_owners = {
+            vehicle.spawn_position: vehicle.owning_player.index for vehicle in vehicles
+        }
+        static_layers_key = (board, tuple(self.spawn_owners.items()))
+        if static_layers_key != self.static_layers_key:
+            self.build_static_layers()
+            self.static_layers_key = static_layers_key
+
+    def load_image(self, path):
+        image = pygame.image.load(path)
+        if self.offscreen:
+            return image  # Converting needs a window, loaded images already have alpha
+        return image.convert_alpha()
 
     def load_images(self):
-        spg_image = pygame.image.load("Images/SPG.png").convert_alpha()
-        light_tank_image = pygame.image.load("Images/Light_Tank.png").convert_alpha()
-        heavy_tank_image = pygame.image.load("Images/Heavy_Tank.png").convert_alpha()
-        medium_tank_image = pygame.image.load("Images/Medium_Tank.png").convert_alpha()
-        tank_destroyer_image = pygame.image.load(
-            "Images/Tank_Destroyer.png"
-        ).convert_alpha()
-
-        self.catapult_image = pygame.image.load("Images/Catapult.png").convert_alpha()
-        self.light_repair_station_image = pygame.image.load(
+        spg_image = self.load_image("Images/SPG.png")
+        light_tank_image = self.load_image("Images/Light_Tank.png")
+        heavy_tank_image = self.load_image("Images/Heavy_Tank.png")
+        medium_tank_image = self.load_image("Images/Medium_Tank.png")
+        tank_destroyer_image = self.load_image("Images/Tank_Destroyer.png")
+
+        self.catapult_image = self.load_image("Images/Catapult.png")
+        self.light_repair_station_image = self.load_image(
             "Images/Light_Repair_Plant.png"
-        ).convert_alpha()
-        self.heavy_repair_station_image = pygame.image.load(
+        )
+        self.heavy_repair_station_image = self.load_image(
             "Images/Heavy_Repair_Plant.png"
-        ).convert_alpha()
+        )
 
         self.hex_images[SPG] = spg_image
         self.hex_images[LIGHT_TANK] = light_tank_image
@@ -80,9 +103,33 @@ class Gui:
         )
         return colored_image
 
-    def draw_hexagon(self, center_x, center_y, q, r, r1, r2, players):
+    def get_tinted_image(self, image, color):
+        """`convert_image_color` result, cached per image and color."""
+        key = (id(image), tuple(color))
+        tinted_image = self.tinted_images.get(key)
+        if tinted_image is None:
+            tinted_image = self.convert_image_color(image, color)
+            self.tinted_images[key] = tinted_image
+        return tinted_image
 
-        rounded_ammount_from_edge = round((self.map_radius + 1 - 5) / 2)
+    def build_static_layers(self):
+        """
+        Render the parts of the map that never change once. `board_surface` holds the background,
+        tiles and stations (drawn below vehicles), `overlay_surface` the borders, obstacles and
+        coordinate labels (drawn above vehicles).
+        """
+        self.board_surface = pygame.Surface(self.screen.get_size())
+        self.board_surface.fill(WHITE)
+        self.overlay_surface = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
+        for q in range(-self.map_radius, self.map_radius + 1):
+            r1 = max(-self.map_radius, -q - self.map_radius)
+            r2 = min(self.map_radius, -q + self.map_radius)
+            for r in range(r1, r2 + 1):
+                x, y = self.calculate_map_position_from_coordinates((q, r))
+                self.draw_hexagon(x, y, q, r)
+
+    def draw_hexagon(self, center_x, center_y, q, r):
+        tile_flags = self.board.tile_flags.get((q, r), 0)
         points = []
 
         for i in range(6):
@@ -92,96 +139,43 @@ class Gui:
             y = center_y + self.hex_size * math.sin(angle_rad)
             points.append((x, y))
 
-        pygame.draw.polygon(self.screen, YELLOW, points)
-
-        for light_repair_station in self.light_repair_stations:
-            if light_repair_station == (q, r):
-                pygame.draw.polygon(self.screen, DARKER_YELLOW, points)
-                pygame.draw.polygon(self.screen, BLACK, points, 2)
-                self.draw_image(self.screen, (q, r), self.light_repair_station_image)
-        for heavy_repair_station in self.heavy_repair_stations:
-            if heavy_repair_station == (q, r):
-                pygame.draw.polygon(self.screen, DARKER_YELLOW, points)
-                pygame.draw.polygon(self.screen, BLACK, points, 2)
-                self.draw_image(self.screen, (q, r), self.heavy_repair_station_image)
-        for catapult in self.catapults:
-            if catapult == (q, r):
-                pygame.draw.polygon(self.screen, DARKER_YELLOW, points)
-                pygame.draw.polygon(self.screen, BLACK, points, 2)
-                self.draw_image(self.screen, (q, r), self.catapult_image)
-
-        for vehicle in self.vehicles:
-            if vehicle.position == (q, r):
-                if vehicle.type == SPG:
-                    image = self.hex_images.get(SPG)
-                elif vehicle.type == LIGHT_TANK:
-                    image = self.hex_images.get(LIGHT_TANK)
-                elif vehicle.type == HEAVY_TANK:
-                    image = self.hex_images.get(HEAVY_TANK)
-                elif vehicle.type == MEDIUM_TANK:
-                    image = self.hex_images.get(MEDIUM_TANK)
-                elif vehicle.type == TANK_DESTROYER:
-                    image = self.hex_images.get(TANK_DESTROYER)
-                if vehicle.owning_player.index == 0:
-                    colored_image = self.convert_image_color(
-                        image, vehicle.owning_player.color
-                    )
-                elif vehicle.owning_player.index == 1:
-                    colored_image = self.convert_image_color(
-                        image, vehicle.owning_player.color
-                    )
-                else:
-                    colored_image = self.convert_image_color(
-                        image, vehicle.owning_player.color
-                    )
-                image_rect = colored_image.get_rect(center=(center_x, center_y))
-                self.screen.blit(colored_image, image_rect)
-
-        if (
-            self.map_radius - rounded_ammount_from_edge
-            >= (-r)
-            >= rounded_ammount_from_edge
-            and q == self.map_radius
-        ):
-            # Blit image onto hexagon
-            pygame.draw.polygon(self.screen, (255, 0, 0), points, 2)
-        elif (
-            self.map_radius - rounded_ammount_from_edge
-            >= -q
-            >= rounded_ammount_from_edge
-            and self.map_radius - rounded_ammount_from_edge
-            >= -r
-            >= rounded_ammount_from_edge
-            and q + r == -self.map_radius
-        ):
-            pygame.draw.polygon(self.screen, (0, 255, 0), points, 2)
-        elif (
-            r == self.map_radius
-            and self.map_radius - rounded_ammount_from_edge
-            >= -q
-            >= rounded_ammount_from_edge
-        ):
-            pygame.draw.polygon(self.screen, (0, 0, 255), points, 2)
-        elif (q, r) in self.capture_area:
-            pygame.draw.polygon(self.screen, (0, 255, 255), points, 2)
+        pygame.draw.polygon(self.board_surface, YELLOW, points)
+
+        station_image = None
+        if tile_flags & LIGHT_REPAIR:
+            station_image = self.light_repair_station_image
+        elif tile_flags & HEAVY_REPAIR:
+            station_image = self.heavy_repair_station_image
+        elif tile_flags & CATAPULT:
+            station_image = self.catapult_image
+        if station_image is not None:
+            pygame.draw.polygon(self.board_surface, DARKER_YELLOW, points)
+            pygame.draw.polygon(self.board_surface, BLACK, points, 2)
+            self.draw_image(self.board_surface, (q, r), station_image)
+
+        spawn_owner = self.spawn_owners.get((q, r))
+        if spawn_owner is not None:
+            color = PLAYER_COLORS[spawn_owner % len(PLAYER_COLORS)]
+            pygame.draw.polygon(self.overlay_surface, color, points, 2)
+        elif tile_flags & CAPTURE_AREA:
+            pygame.draw.polygon(self.overlay_surface, (0, 255, 255), points, 2)
         else:
-            if (q, r) in self.obstacles:
-                pygame.draw.polygon(self.screen, (0, 120, 125), points)
+            if tile_flags & OBSTACLE:
+                pygame.draw.polygon(self.overlay_surface, (0, 120, 125), points)
 
-            pygame.draw.polygon(self.screen, BLACK, points, 2)
+            pygame.draw.polygon(self.overlay_surface, BLACK, points, 2)
 
         draw_coordinates = True
         if draw_coordinates:
             # Draw coordinates
-            font = pygame.font.Font(None, 20)
-            text = font.render(f"{q},{r}", True, BLACK)
+            text = self.label_font.render(f"{q},{r}", True, BLACK)
             text_rect = text.get_rect(center=(center_x, center_y))
-            self.screen.blit(text, text_rect)
+            self.overlay_surface.blit(text, text_rect)
 
     def draw_image(self, surface: pygame.Surface, location, image):
         center_x, center_y = self.calculate_map_position_from_coordinates(location)
 
-        colored_image = self.convert_image_color(image, BLACK)
+        colored_image = self.get_tinted_image(image, BLACK)
         image_rect = colored_image.get_rect(center=(center_x, center_y))
         surface.blit(colored_image, image_rect)
 
@@ -194,13 +188,20 @@ class Gui:
         return center_x, center_y
 
     def draw_hexagonal_map(self, game):
-        for q in range(-self.map_radius, self.map_radius + 1):
-            r1 = max(-self.map_radius, -q - self.map_radius)
-            r2 = min(self.map_radius, -q + self.map_radius)
-            for r in range(r1, r2 + 1):
-                x = self.center_x + 3 / 2 * self.hex_size * q
-                y = self.center_y + math.sqrt(3) * self.hex_size * (r + q / 2)
-                self.draw_hexagon(x, y, q, r, r1, r2, game.players)
+        """Draw the cached static layers with the vehicles in between."""
+        self.screen.blit(self.board_surface, (0, 0))
+        for vehicle in game.vehicles:
+            q, r = vehicle.position
+            if max(abs(q), abs(r), abs(q + r)) > self.map_radius:
+                continue  # Only vehicles on map tiles are drawn
+            colored_image = self.get_tinted_image(
+                self.hex_images[vehicle.type], vehicle.owning_player.color
+            )
+            image_rect = colored_image.get_rect(
+                center=self.calculate_map_position_from_coordinates((q, r))
+            )
+            self.screen.blit(colored_image, image_rect)
+        self.screen.blit(self.overlay_surface, (0, 0))
         self.draw_extra_info(
             game.players,
             game.vehicles,
@@ -272,4 +273,30 @@ class Gui:
         text_rect = text.get_rect(right=self.screen.get_width() - 650, top=text_y + 150)
         self.screen.blit(text, text_rect)
 
-        pygame.display.flip()
+        if not self.offscreen:
+            pygame.display.flip()
+
+
+# Offscreen flag -> Gui
+_guis: dict[bool, Gui] = {}
+
+
+def get_gui(
+    hex_size,
+    map_radius,
+    vehicles,
+    board,
+    offscreen=False,
+) -> Gui:
+    """
+    Get the `Gui` shared by all games of this process, bound to the given game state.
+    The window, images and static layers are only created again if the map size changes.
+    Offscreen guis (drawing into a surface only) are kept separately from the window.
+    """
+    gui = _guis.get(offscreen)
+    if gui is None or (gui.hex_size, gui.map_radius) != (hex_size, map_radius):
+        gui = Gui(hex_size, map_radius, vehicles, board, offscreen)
+        _guis[offscreen] = gui
+    else:
+        gui.bind_game_state(vehicles, board)
+    return gui
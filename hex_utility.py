@@ -43,16 +43,3 @@ def cube_spiral(center, radius):
         results.extend(cube_ring(center, i))
     return results
 
-
-def check_neutrality(
-    attacking_player,
-    target_player,
-    matrix: list[list[int]],
-) -> bool:
-    """Check if attacker vehicle can attack target vehicle based on attack matrix"""
-    gotAttackedByTarget = matrix[target_player][attacking_player]
-    targetGotAttacked = False
-    for list in matrix:
-        if list[target_player] == 1:
-            targetGotAttacked = True
-    return gotAttackedByTarget == 1 or (not targetGotAttacked)
@@ -6,9 +6,10 @@ import pygame
 def main():
     env = TankEnv(True)
 
-    env.player0 = Player("Player1", RED, 0)
-    env.player2 = Player("Player2", GREEN, 1)
-    env.player1 = Player("Player3", BLUE, 2)
+    env.players = [
+        Player(f"Player{index + 1}", PLAYER_COLORS[index], index)
+        for index in range(env.num_players)
+    ]
     env.screen = None
     env.reset_state()
 
@@ -0,0 +1,258 @@
+import contextlib
+import io
+import math
+import random
+import time
+import numpy as np
+from game import *
+from player import *
+
+# Capture points are worth this many kill points when scoring unfinished games
+CAPTURE_SCORE_WEIGHT = 2
+# Score lead that counts as a clear advantage (value ~0.88) for unfinished games
+SCORE_SCALE = 5
+
+
+class MctsNode:
+    """Own decision in the search tree, children are keyed by action."""
+
+    def __init__(self):
+        self.visits = 0
+        self.value_sum = 0.0
+        self.children: dict[int, "MctsNode"] = {}
+        # Expanded from the end, so the rollout policy's choice is tried first
+        self.untried_actions: list[int] | None = None
+
+    def select_child(self, exploration: float) -> int:
+        """Action of the child with the highest UCB1 score."""
+        log_visits = math.log(self.visits)
+        best_action = None
+        best_score = -math.inf
+        for action, child in self.children.items():
+            score = child.value_sum / child.visits + exploration * math.sqrt(
+                log_visits / child.visits
+            )
+            if score > best_score:
+                best_action = action
+                best_score = score
+        return best_action
+
+
+class MctsPlayer(ReinforcementLearningPlayer):
+    """
+    Player that chooses each tank action with Monte Carlo tree search over the 37 actions of
+    `ReinforcementLearningPlayer`.
+
+    The tree holds only this player's decisions (open loop), other seats act in between with their
+    own logic: scripted players plan as usual, seats that need an action (learning or MCTS players)
+    take rollout actions. After expanding a node the game is played on for `rollout_depth` tank
+    actions and scored. Rollout actions are cheap greedy ones (shoot if there is a target, else step
+    down the capture distance field), random valid actions with `rollout_randomness` probability. Game state is branched with
+    `Game.snapshot` / `Game.restore`.
+
+    The search stops after `iterations` iterations or `time_budget` seconds, whichever comes first
+    (None disables a limit). Rollouts are cut off at the deadline, so a move never takes much
+    longer than the time budget.
+    """
+
+    # Set while any MCTS search runs, MCTS seats inside the search only execute their action
+    searching = False
+
+    def __init__(
+        self,
+        name,
+        color,
+        index,
+        time_budget: float | None = 0.1,
+        iterations: int | None = None,
+        rollout_depth: int = 15,
+        rollout_randomness: float = 0.3,
+        exploration: float = 1.4,
+        seed=None,
+    ):
+        super().__init__(name, color, index)
+        if time_budget is None and iterations is None:
+            raise ValueError("MctsPlayer needs a time budget or an iteration limit")
+        self.time_budget = time_budget
+        self.iterations = iterations
+        self.rollout_depth = rollout_depth
+        self.rollout_randomness = rollout_randomness
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.last_search_iterations = 0
+
+    def make_action(
+        self, map: "Game", current_tank_index: int, players: list["Player"], action: int
+    ) -> tuple[str, int]:
+        """Searches for the best action of the current tank and makes it."""
+        if MctsPlayer.searching:
+            return super().make_action(map, current_tank_index, players, action)
+        action = self.search(map)
+        action_result, _ = super().make_action(map, current_tank_index, players, action)
+        return action_result, 0  # Like scripted players, no reward for the learning player
+
+    def search(self, map: "Game") -> int:
+        deadline = None
+        if self.time_budget is not None:
+            deadline = time.perf_counter() + self.time_budget
+        root_mask = map.get_action_mask(self.vehicles[map.current_tank_index])
+        root = MctsNode()
+        root.untried_actions = self.get_untried_actions(map)
+
+        root_snapshot = map.snapshot()
+        use_gui = map.use_gui
+        gui_last_moves = [vehicle.gui_last_move for vehicle in map.vehicles]
+        action_result = map.action_result
+        map.use_gui = False
+        MctsPlayer.searching = True
+        iteration = 0
+        try:
+            # The game prints collisions and winners, keep simulated ones quiet
+            with contextlib.redirect_stdout(io.StringIO()):
+                while (self.iterations is None or iteration < self.iterations) and (
+                    deadline is None or time.perf_counter() < deadline
+                ):
+                    completed = self.run_iteration(map, root, deadline)
+                    map.restore(root_snapshot)
+                    if not completed:
+                        break
+                    iteration += 1
+        finally:
+            MctsPlayer.searching = False
+            map.restore(root_snapshot)
+            map.use_gui = use_gui
+            for vehicle, gui_last_move in zip(map.vehicles, gui_last_moves):
+                vehicle.gui_last_move = gui_last_move
+            map.action_result = action_result
+        self.last_search_iterations = iteration
+
+        if not root.children:
+            return self.random_action(root_mask)
+        # Most visited action, with a small budget visits tie and the better value decides
+        return max(
+            root.children,
+            key=lambda action: (
+                root.children[action].visits,
+                root.children[action].value_sum / root.children[action].visits,
+            ),
+        )
+
+    def get_untried_actions(self, map: "Game") -> list[int]:
+        """Valid actions of the current tank in random order, the greedy choice last."""
+        vehicle = self.vehicles[map.current_tank_index]
+        actions = np.flatnonzero(map.get_action_mask(vehicle)).tolist()
+        self.rng.shuffle(actions)
+        greedy_action = self.greedy_action(map, vehicle)
+        if greedy_action in actions:
+            actions.remove(greedy_action)
+            actions.append(greedy_action)
+        return actions
+
+    def run_iteration(self, map: "Game", root: MctsNode, deadline: float | None) -> bool:
+        """
+        One selection, expansion, rollout and backup. Returns False when the deadline passed
+        before the expansion, the iteration is then abandoned without a backup.
+        """
+        node = root
+        path = [root]
+        # Selection and expansion, other seats act in between
+        while not map.done:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            if map.current_index != self.index:
+                self.make_rollout_action(map)
+                continue
+            if node.untried_actions is None:
+                node.untried_actions = self.get_untried_actions(map)
+            if node.untried_actions:
+                action = node.untried_actions.pop()
+                map.make_game_action(action)
+                child = MctsNode()
+                node.children[action] = child
+                path.append(child)
+                break
+            action = node.select_child(self.exploration)
+            map.make_game_action(action)
+            node = node.children[action]
+            path.append(node)
+
+        # Rollout
+        for _ in range(self.rollout_depth):
+            if map.done or (deadline is not None and time.perf_counter() >= deadline):
+                break
+            self.make_rollout_action(map)
+
+        value = self.evaluate(map)
+        for node in path:
+            node.visits += 1
+            node.value_sum += value
+        return True
+
+    def make_rollout_action(self, map: "Game"):
+        """Rollout action for seats that need one, scripted players choose themselves."""
+        player = map.players[map.current_index]
+        action = 0
+        if isinstance(player, ReinforcementLearningPlayer):
+            action = self.rollout_action(map, player.vehicles[map.current_tank_index])
+        map.make_game_action(action)
+
+    def rollout_action(self, map: "Game", vehicle: "Vehicle") -> int:
+        if self.rng.random() < self.rollout_randomness:
+            return self.random_action(map.get_action_mask(vehicle))
+        return self.greedy_action(map, vehicle)
+
+    def greedy_action(self, map: "Game", vehicle: "Vehicle") -> int:
+        """Shoot if there is a target, else step down the capture distance field."""
+        mask = map.get_action_mask(vehicle)
+        if mask[SHOOT_ACTION] and mask[:SHOOT_ACTION].any():
+            return SHOOT_ACTION  # Shooting is only allowed with a target when moves are possible
+        next_move = map.find_next_move_to_capture_area(vehicle, ignore_vehicles=True)
+        if next_move is not None:
+            direction = (
+                next_move[0] - vehicle.position[0],
+                next_move[1] - vehicle.position[1],
+            )
+            action = ACTIONS_BY_DIRECTION.get(direction)
+            if action is not None and mask[action]:
+                return action
+        return self.random_action(mask)
+
+    def random_action(self, mask: np.ndarray) -> int:
+        return self.rng.choice(np.flatnonzero(mask).tolist())
+
+    def evaluate(self, map: "Game") -> float:
+        """
+        Value of the game state for this player between 0 and 1. Finished games are 1 for a win,
+        0.5 for a shared win and 0 otherwise, unfinished ones compare scores with the best enemy.
+        """
+        capture_points = map.vehicle_store.capture_points_by_owner(len(map.players))
+        kill_points = [player.kill_points for player in map.players]
+        if map.done:
+            winners = [
+                index
+                for index, points in enumerate(capture_points)
+                if points >= CAPTURE_POINTS_TO_WIN
+            ]
+            if not winners:
+                winners = list(range(len(map.players)))  # Game ended by maximum turns
+            most_kill_points = max(kill_points[index] for index in winners)
+            winners = [
+                index for index in winners if kill_points[index] == most_kill_points
+            ]
+            if self.index not in winners:
+                return 0.0
+            return 1.0 if len(winners) == 1 else 0.5
+
+        # Vehicles in the capture area count as the capture points they are about to get
+        for vehicle in map.vehicles:
+            if map.in_capture_area(vehicle.position):
+                capture_points[vehicle.owning_player.index] += 1
+        scores = [
+            CAPTURE_SCORE_WEIGHT * capture + kills
+            for capture, kills in zip(capture_points, kill_points)
+        ]
+        best_enemy_score = max(
+            score for index, score in enumerate(scores) if index != self.index
+        )
+        lead = scores[self.index] - best_enemy_score
+        return 0.5 + 0.5 * math.tanh(lead / SCORE_SCALE)
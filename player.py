@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from constants import *
 from hex_utility import *
 from typing import TYPE_CHECKING
@@ -6,9 +7,58 @@ if TYPE_CHECKING:
     from game import Game
     from vehicle import Vehicle
 REWARD_FOR_CORRECT_MOVE = 2
+# Reserved move plans kept by `Player.plan_cache`
+PLAN_CACHE_SIZE = 100000
+
+
+class PlanCache:
+    """
+    Bounded LRU transposition table of scripted bot plans (the reserved move of every vehicle),
+    keyed by player index and `Game.get_state_key`. Counts hits and misses for its hit rate.
+    """
+
+    def __init__(self, max_size: int = PLAN_CACHE_SIZE):
+        self.max_size = max_size
+        self.plans: OrderedDict[tuple, tuple] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> tuple | None:
+        plan = self.plans.get(key)
+        if plan is None:
+            self.misses += 1
+            return None
+        self.plans.move_to_end(key)
+        self.hits += 1
+        return plan
+
+    def put(self, key: tuple, plan: tuple):
+        if self.max_size <= 0:
+            return
+        self.plans[key] = plan
+        if len(self.plans) > self.max_size:
+            self.plans.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def pop_counts(self) -> tuple[int, int]:
+        """Hits and misses since the last call."""
+        counts = (self.hits, self.misses)
+        self.hits = 0
+        self.misses = 0
+        return counts
+
+    def clear(self):
+        self.plans.clear()
 
 
 class Player:
+    # Shared by all scripted players of this process
+    plan_cache = PlanCache()
+
     def __init__(self, name, color, index):
         self.name = name
         self.points = 0
@@ -24,20 +74,30 @@ class Player:
         self, map: "Game", current_tank_index: int, players: list["Player"], action: int
     ) -> tuple[str, int]:
         """Action works by first going through all tanks and reserving moves."""
-        vehicle_map = {}
-        for vehicle in map.vehicles:
-            vehicle_map[vehicle.position] = vehicle
-
         if current_tank_index == 0:
-            # Reset reserved moves
-            for vehicle in self.vehicles:
-                vehicle.reserved_move = ()
+            # The same states come up in many games, plans are looked up before planning
+            key = (self.index, map.get_state_key())
+            plan = Player.plan_cache.get(key)
+            if plan is None:
+                # Reset reserved moves
+                for vehicle in self.vehicles:
+                    vehicle.reserved_move = ()
 
-            # Eeserve capture and shooting moves
-            self.any_vehicles_can_shoot(map)
-            self.any_vehicles_can_capture_move(
-                map, current_tank_index, vehicle_map, players
-            )
+                # Eeserve capture and shooting moves
+                self.any_vehicles_can_shoot(map)
+                self.any_vehicles_can_capture_move(
+                    map, current_tank_index, map.vehicle_map, players
+                )
+                Player.plan_cache.put(
+                    key, tuple(vehicle.reserved_move for vehicle in self.vehicles)
+                )
+            else:
+                for vehicle, reserved_move in zip(self.vehicles, plan):
+                    vehicle.reserved_move = reserved_move
+                # Like planning, refresh the capture points of every player
+                capture_points = map.vehicle_store.capture_points_by_owner(len(players))
+                for player, points in zip(players, capture_points):
+                    player.capture_points = points
 
         for vehicle in self.vehicles:
             if vehicle.vehicleIndex == current_tank_index:
@@ -55,56 +115,41 @@ class Player:
         self,
         map: "Game",
         current_tank_index: int,
-        vehicle_map: set[tuple[int, int]],
+        vehicle_map: dict[tuple[int, int], list["Vehicle"]],
         players: list["Player"],
     ):
         "Reserve moves for capturing points."
         tiles_reserved = []
-        for vehicle in self.vehicles:
-            if vehicle.position in map.capture_area:
-                continue
-            enemy_fire_hexagons = []
-            for enemy_vehicle in map.vehicles:
-                if enemy_vehicle.owning_player.index != vehicle.owning_player.index:
-                    if enemy_vehicle.type == TANK_DESTROYER:
-                        enemy_fire_hexagons += map.get_tank_destroyer_shootable_tiles(
-                            enemy_vehicle.position
-                        )
-                    else:
-                        enemy_fire_hexagons += map.get_tiles_in_radius(
-                            enemy_vehicle.position, enemy_vehicle.shooting_range
-                        )
-
-            immediate_movement_tiles = map.get_tiles_in_radius_true(
-                vehicle.position, vehicle.sp
-            )
-            enemy_fire_hexagon_tiles = [
-                x for x in enemy_fire_hexagons if x in immediate_movement_tiles
-            ]
-
-            lst = [0, 0, 0]
-            for all_vehicle in map.vehicles:
-                lst[all_vehicle.owning_player.index] += all_vehicle.capture_points
+        lst = map.vehicle_store.capture_points_by_owner(len(players))
+        for player, points in zip(players, lst):
+            player.capture_points = points
 
-            for player, points in zip(players, lst):
-                player.capture_points = points
+        # Enemy fire is ignored when an enemy is close to winning
+        enemy_close_to_winning = False
+        for index, element in enumerate(lst):
+            if element >= 3 and index != self.index:
+                enemy_close_to_winning = True
+        enemy_fire_hexagons = map.get_enemy_threat(self.index)
 
-            for index, element in enumerate(lst):
-                if element >= 3 and index != self.index:
-                    enemy_fire_hexagon_tiles = []
+        for vehicle in self.vehicles:
+            if map.in_capture_area(vehicle.position):
+                continue
+            enemy_fire_hexagon_tiles = []
+            if not enemy_close_to_winning:
+                for tile in map.board.disc(vehicle.position, vehicle.sp):
+                    if tile in enemy_fire_hexagons:
+                        enemy_fire_hexagon_tiles.append(tile)
 
             if len(tiles_reserved) > 0:
                 enemy_fire_hexagon_tiles += tiles_reserved
 
-            lol = map.find_best_path_multiple_goals(
-                vehicle, map.capture_area, vehicle_map, 10, enemy_fire_hexagon_tiles
+            next_move = map.find_next_move_to_capture_area(
+                vehicle, enemy_fire_hexagon_tiles
             )
 
-            if lol is not None:
-                if len(lol) >= 2 and len(vehicle.reserved_move) == 0:
-                    temporary = lol[1]
-                    tiles_reserved.append(lol[1])
-                    vehicle.reserved_move = ("move", lol[1])
+            if next_move is not None and len(vehicle.reserved_move) == 0:
+                tiles_reserved.append(next_move)
+                vehicle.reserved_move = ("move", next_move)
 
     def any_vehicles_can_shoot(self, map: "Game"):
         "Reserve moves for shooting."
@@ -114,7 +159,7 @@ class Player:
             shooting_target_position = None
             shooting_target_vehicle = None
             poguus = vehicle.get_shootable_vehicles(
-                map.obstacles, map.vehicles, map.neutrality_matrix
+                map.obstacles, map.vehicle_map, map.may_attack
             )
 
             for list in poguus:
@@ -128,21 +173,21 @@ class Player:
                         shooting_target_position = list[0]
                         shooting_target_vehicle = target_vehicle
                     # If current in capture area and old not in capture area.
-                    elif (target_vehicle.position in map.capture_area) and not (
-                        shooting_target_position in map.capture_area
-                    ):
+                    elif map.in_capture_area(
+                        target_vehicle.position
+                    ) and not map.in_capture_area(shooting_target_position):
                         shooting_target_position = list[0]
                         shooting_target_vehicle = target_vehicle
                     # If old not in capture area, check hp. Choose always ones with lower
-                    elif not (shooting_target_position in map.capture_area) and (
+                    elif not map.in_capture_area(shooting_target_position) and (
                         shooting_target_vehicle.hp > target_vehicle.hp
                     ):
                         shooting_target_position = list[0]
                         shooting_target_vehicle = target_vehicle
                     # If both in capture area check hp
                     elif (
-                        (shooting_target_position in map.capture_area)
-                        and (target_vehicle.position in map.capture_area)
+                        map.in_capture_area(shooting_target_position)
+                        and map.in_capture_area(target_vehicle.position)
                         and (shooting_target_vehicle.hp > target_vehicle.hp)
                     ):
                         shooting_target_position = list[0]
@@ -164,43 +209,16 @@ class ReinforcementLearningPlayer(Player):
         self, map: "Game", current_tank_index: int, players: list["Player"], action: int
     ) -> tuple[str, int]:
         """Makes an action based on model"""
-        if action != 36:  # move
-            directions = [(1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1),
-                (2, -1), (1, -2), (-1, -1), (-2, 0), (-1, 2), (1, 1),
-                (2, 0), (2, -2), (0, -2), (-2, 1), (-2, 2), (0, 2),
-                (0,-3), (1,-3), (2,-3), (3,-3), (3,-2), (3,-1), (3, 0), (2, 1), (1,2), (0, 3), (-1, 3), (-2, 3), (-3, 3), (-3,2), (-3,1), (-3, 0), (-2, -1), (-1,-2)]
-
-            directions2Tile = [
-                (2, -1), (1, -2), (-1, -1), (-2, 0), (-1, 2), (1, 1),
-                (2, 0), (2, -2), (0, -2), (-2, 1), (-2, 2), (0, 2)]
-            
-            directions3Tile = [
-                (0,-3), (1,-3), (2,-3), (3,-3), (3,-2), (3,-1), (3, 0), (2, 1), (1,2), (0, 3), (-1, 3), (-2, 3), (-3, 3), (-3,2), (-3,1), (-3, 0), (-2, -1), (-1,-2)]
-            
-
-            directions_mapping = {
-                direction: index for index, direction in enumerate(directions)
-            }
-            reverse_directions_mapping = {
-                index: direction for direction, index in directions_mapping.items()
-            }
-
-            for vehicle in map.vehicles:
-                if (
-                    vehicle.owning_player == self
-                    and vehicle.vehicleIndex == current_tank_index
-                ):
+        if action != SHOOT_ACTION:  # move
+            for vehicle in self.vehicles:
+                if vehicle.vehicleIndex == current_tank_index:
                     old_position = vehicle.position
 
                     # Move action
                     action = int(action)  # So load works
-                    direction = reverse_directions_mapping.get(action)
+                    direction = ACTION_DIRECTIONS[action]
 
-                    if direction in directions2Tile and vehicle.sp < 2:
-                        return "Tank didn't move, illegal action", -(
-                            REWARD_FOR_CORRECT_MOVE
-                        )
-                    if direction in directions3Tile and vehicle.sp < 3:
+                    if ACTION_SPEED_POINTS[action] > vehicle.sp:
                         return "Tank didn't move, illegal action", -(
                             REWARD_FOR_CORRECT_MOVE
                         )
@@ -246,15 +264,12 @@ class ReinforcementLearningPlayer(Player):
                         )
         # shoot
         else:
-            for vehicle in map.vehicles:
-                if (
-                    vehicle.owning_player == self
-                    and vehicle.vehicleIndex == current_tank_index
-                ):
+            for vehicle in self.vehicles:
+                if vehicle.vehicleIndex == current_tank_index:
                     shooting_target_position = None
                     shooting_target_vehicle = None
                     poguus = vehicle.get_shootable_vehicles(
-                        map.obstacles, map.vehicles, map.neutrality_matrix
+                        map.obstacles, map.vehicle_map, map.may_attack
                     )
 
                     for list in poguus:
@@ -268,21 +283,21 @@ class ReinforcementLearningPlayer(Player):
                                 shooting_target_position = list[0]
                                 shooting_target_vehicle = target_vehicle
                             # If current in capture area and old not in capture area.
-                            elif (target_vehicle.position in map.capture_area) and not (
-                                shooting_target_position in map.capture_area
-                            ):
+                            elif map.in_capture_area(
+                                target_vehicle.position
+                            ) and not map.in_capture_area(shooting_target_position):
                                 shooting_target_position = list[0]
                                 shooting_target_vehicle = target_vehicle
                             # If old not in capture area, check hp. Choose always ones with lower
-                            elif not (
-                                shooting_target_position in map.capture_area
-                            ) and (shooting_target_vehicle.hp > target_vehicle.hp):
+                            elif not map.in_capture_area(shooting_target_position) and (
+                                shooting_target_vehicle.hp > target_vehicle.hp
+                            ):
                                 shooting_target_position = list[0]
                                 shooting_target_vehicle = target_vehicle
                             # If both in capture area check hp
                             elif (
-                                (shooting_target_position in map.capture_area)
-                                and (target_vehicle.position in map.capture_area)
+                                map.in_capture_area(shooting_target_position)
+                                and map.in_capture_area(target_vehicle.position)
                                 and (shooting_target_vehicle.hp > target_vehicle.hp)
                             ):
                                 shooting_target_position = list[0]
@@ -298,3 +313,16 @@ class ReinforcementLearningPlayer(Player):
                         )
 
             return "Nothing to shoot", 0
+
+
+class PolicyPlayer(ReinforcementLearningPlayer):
+    """
+    Opponent seat taking the same actions as the learning player, chosen outside the game
+    (e.g. by a frozen policy in self-play). Its rewards don't count for the learning player.
+    """
+
+    def make_action(
+        self, map: "Game", current_tank_index: int, players: list["Player"], action: int
+    ) -> tuple[str, int]:
+        action_result, _ = super().make_action(map, current_tank_index, players, action)
+        return action_result, 0
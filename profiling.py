@@ -0,0 +1,204 @@
+"""
+Optional per phase timers for the simulator, written to TensorBoard by `PhaseTimingCallback`.
+
+Timing works by wrapping the methods of each phase while it is enabled, so it costs nothing
+when disabled. Enable it before creating the env when the env runs in worker processes, they
+inherit the wrapped methods when forked.
+"""
+import functools
+import sys
+import time
+from stable_baselines3.common.callbacks import BaseCallback
+from batched_env import BatchedTankVecEnv
+from game import Game
+from player import Player
+from shared_vec_env import SharedMemoryVecEnv
+from tankenv import TankEnv
+
+# Phase -> (class, method name) pairs timed as that phase. "env_other" is env time outside the
+# other phases (moving vehicles, respawns, turn order, ...).
+PHASE_METHODS = {
+    "bot_planning": [
+        (Player, "any_vehicles_can_shoot"),
+        (Player, "any_vehicles_can_capture_move"),
+    ],
+    "pathfinding": [
+        (Game, "find_next_move_to_capture_area"),
+        (Game, "find_best_path_multiple_goals"),
+        (Game, "find_best_path_multiple_goals_non_vehicle"),
+        (Game, "find_path_single_goal"),
+    ],
+    "shooting": [(Game, "shoot")],
+    "end_of_round": [(Game, "end_of_round"), (Game, "determine_winner_max_turns")],
+    "observation": [(TankEnv, "prepare_observation")],
+    "rendering": [(TankEnv, "render")],
+    "env_other": [
+        (TankEnv, "step"),
+        (TankEnv, "reset"),
+        (BatchedTankVecEnv, "step_wait"),
+        (BatchedTankVecEnv, "reset"),
+    ],
+}
+PHASES = list(PHASE_METHODS)
+
+
+class PhaseTimers:
+    """
+    Seconds spent in each phase since the last `pop`. Time of a phase running inside another
+    one (pathfinding during bot planning) only counts for the inner phase, so the phases add up
+    to the total env time.
+    """
+
+    def __init__(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        # Time of inner phases of every running phase
+        self.inner_times: list[float] = []
+        self.originals = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.originals)
+
+    def enable(self):
+        if self.enabled:
+            return
+        for phase, methods in PHASE_METHODS.items():
+            for cls, name in methods:
+                method = cls.__dict__[name]
+                self.originals[(cls, name)] = method
+                setattr(cls, name, self.timed(phase, method))
+        self.enable_rendering()
+
+    def enable_rendering(self):
+        """
+        Also time drawing done by games with use_gui. `Gui` is wrapped once a game loads it, so
+        headless processes still never import pygame.
+        """
+        if "gui" in sys.modules:
+            self.wrap_gui()
+            return
+        get_gui = Game.__dict__["get_gui"]
+        self.originals[(Game, "get_gui")] = get_gui
+
+        @functools.wraps(get_gui)
+        def wrapper(game, *args, **kwargs):
+            gui = get_gui(game, *args, **kwargs)
+            if self.originals.pop((Game, "get_gui"), None) is not None:
+                Game.get_gui = get_gui
+                self.wrap_gui()
+            return gui
+
+        Game.get_gui = wrapper
+
+    def wrap_gui(self):
+        from gui import Gui
+
+        method = Gui.__dict__["draw_hexagonal_map"]
+        self.originals[(Gui, "draw_hexagonal_map")] = method
+        setattr(Gui, "draw_hexagonal_map", self.timed("rendering", method))
+
+    def disable(self):
+        for (cls, name), method in self.originals.items():
+            setattr(cls, name, method)
+        self.originals = {}
+
+    def timed(self, phase: str, method):
+        totals = self.totals
+        inner_times = self.inner_times
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            inner_times.append(0.0)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                totals[phase] += elapsed - inner_times.pop()
+                if inner_times:
+                    inner_times[-1] += elapsed
+
+        return wrapper
+
+    def pop(self) -> dict[str, float]:
+        """Phase times since the last call."""
+        totals = dict(self.totals)
+        for phase in self.totals:
+            self.totals[phase] = 0.0
+        return totals
+
+
+phase_timers = PhaseTimers()
+
+
+class PhaseTimingCallback(BaseCallback):
+    """
+    Records where the time of each rollout went as TensorBoard scalars, in seconds:
+
+    - timing/<phase>: env time per phase (averaged over env processes with `SharedMemoryVecEnv`)
+    - timing/env, timing/collection: all env time and the wall time of collecting the rollout
+    - timing/policy: collection time outside the env (policy forward passes, rollout buffer)
+    - timing/learner: time of the previous policy update
+    - timing/env_fraction: env share of collection and learner time
+    - bots/plan_cache_hit_rate: share of scripted bot plans found in `Player.plan_cache`
+    """
+
+    def __init__(self, verbose=0):
+        super().__init__(verbose)
+        self.rollout_start = 0.0
+        self.rollout_end = None
+        self.learner_time = 0.0
+
+    def _on_training_start(self):
+        phase_timers.enable()
+        self.rollout_end = None
+
+    def _on_rollout_start(self):
+        now = time.perf_counter()
+        if self.rollout_end is not None:
+            self.learner_time = now - self.rollout_end
+        self.pop_phase_times()  # Drop env time spent outside rollouts (e.g. the first reset)
+        self.rollout_start = now
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _on_rollout_end(self):
+        self.rollout_end = time.perf_counter()
+        collection_time = self.rollout_end - self.rollout_start
+        phase_times = self.pop_phase_times()
+        env_time = sum(phase_times.values())
+        for phase, seconds in phase_times.items():
+            self.logger.record(f"timing/{phase}", seconds)
+        self.logger.record("timing/env", env_time)
+        self.logger.record("timing/collection", collection_time)
+        self.logger.record("timing/policy", max(collection_time - env_time, 0.0))
+        self.logger.record("timing/learner", self.learner_time)
+        self.logger.record(
+            "timing/env_fraction", env_time / (collection_time + self.learner_time)
+        )
+        hits, misses = self.pop_plan_cache_counts()
+        if hits + misses > 0:
+            self.logger.record("bots/plan_cache_hit_rate", hits / (hits + misses))
+
+    def uses_env_processes(self) -> bool:
+        return isinstance(self.training_env.unwrapped, SharedMemoryVecEnv)
+
+    def pop_plan_cache_counts(self) -> tuple[int, int]:
+        """Plan cache hits and misses of the env processes since the last call."""
+        if self.uses_env_processes():
+            counts = self.training_env.env_method("pop_plan_cache_counts")
+        else:
+            counts = [Player.plan_cache.pop_counts()]
+        return sum(hits for hits, _ in counts), sum(misses for _, misses in counts)
+
+    def pop_phase_times(self) -> dict[str, float]:
+        """Phase times of the env processes since the last call, averaged over processes."""
+        if self.uses_env_processes():
+            reports = self.training_env.env_method("pop_phase_times")
+        else:
+            reports = [phase_timers.pop()]
+        return {
+            phase: sum(report[phase] for report in reports) / len(reports)
+            for phase in PHASES
+        }
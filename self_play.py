@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class OpponentPool:
+    """
+    Frozen policies (e.g. earlier PPO checkpoints) playing the opponent seats of self-play envs,
+    see `SharedMemoryVecEnv`. Every game draws one policy per seat, `predict` runs one batched
+    forward pass per policy over all seats it plays. With use_action_masks the policies are
+    MaskablePPO models and only sample actions valid for the seat's tank.
+    """
+
+    def __init__(
+        self,
+        policies=(),
+        deterministic: bool = False,
+        seed=None,
+        use_action_masks: bool = False,
+    ):
+        self.policies = list(policies)
+        self.deterministic = deterministic
+        self.use_action_masks = use_action_masks
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def load(cls, paths, use_action_masks: bool = False, **kwargs) -> "OpponentPool":
+        """Pool of the checkpoints at paths."""
+        if use_action_masks:
+            from sb3_contrib import MaskablePPO as model_class
+        else:
+            from stable_baselines3 import PPO as model_class
+        return cls(
+            [model_class.load(path, device="cpu") for path in paths],
+            use_action_masks=use_action_masks,
+            **kwargs,
+        )
+
+    def add(self, policy):
+        """Add a policy, e.g. a frozen copy of the model being trained."""
+        self.policies.append(policy)
+
+    def draw(self, count: int) -> np.ndarray:
+        """Policy indexes for count seats, all policies equally likely."""
+        if not self.policies:
+            raise ValueError("Opponent pool has no policies")
+        return self.rng.integers(len(self.policies), size=count)
+
+    def predict(
+        self,
+        observations: np.ndarray,
+        policy_indexes: np.ndarray,
+        action_masks: np.ndarray = None,
+    ) -> np.ndarray:
+        """
+        Actions for the seat observations, observation i is played by policy_indexes[i].
+        action_masks (one row per observation) are passed on when the pool uses action masks.
+        """
+        actions = np.zeros(len(observations), dtype=np.int64)
+        for policy_index in np.unique(policy_indexes):
+            seats = policy_indexes == policy_index
+            kwargs = {}
+            if self.use_action_masks:
+                kwargs["action_masks"] = action_masks[seats]
+            actions[seats], _ = self.policies[policy_index].predict(
+                observations[seats], deterministic=self.deterministic, **kwargs
+            )
+        return actions
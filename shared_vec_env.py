@@ -0,0 +1,262 @@
+import multiprocessing as mp
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+
+def _buffer_view(buffer, dtype, shape) -> np.ndarray:
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+
+def _worker(remote, parent_remote, index, env_fn, buffers, observation_shape, write_masks):
+    """Step one env, reading its action from and writing its results to the shared buffers."""
+    parent_remote.close()
+    num_envs = len(buffers["rewards"])
+    shape = (num_envs, *observation_shape)
+    observations = _buffer_view(buffers["observations"], np.int32, shape)
+    terminal_observations = _buffer_view(buffers["terminal_observations"], np.int32, shape)
+    rewards = _buffer_view(buffers["rewards"], np.float32, (num_envs,))
+    dones = _buffer_view(buffers["dones"], np.bool_, (num_envs,))
+    actions = _buffer_view(buffers["actions"], np.int64, (num_envs,))
+    opponent_observations = _buffer_view(buffers["opponent_observations"], np.int32, shape)
+    waiting_seats = _buffer_view(buffers["waiting_seats"], np.int32, (num_envs,))
+    opponent_actions = _buffer_view(buffers["opponent_actions"], np.int64, (num_envs,))
+    opponent_masks = _buffer_view(buffers["opponent_masks"], np.bool_, (num_envs, -1))
+
+    def write_opponent():
+        seat = env.opponent_to_act()
+        waiting_seats[index] = seat
+        if seat >= 0:
+            opponent_observations[index] = env.get_seat_observation(seat)
+            if write_masks:
+                opponent_masks[index] = env.get_seat_action_mask(seat)
+
+    env = env_fn()
+    while True:
+        command, data = remote.recv()
+        if command == "advance":
+            env.play_until_decision()
+            write_opponent()
+            remote.send(None)
+        elif command == "step_opponent":
+            env.step_opponent(int(opponent_actions[index]))
+            write_opponent()
+            remote.send(None)
+        elif command == "step":
+            observation, reward, terminated, truncated, _ = env.step(int(actions[index]))
+            done = terminated or truncated
+            if done:
+                terminal_observations[index] = observation
+                observation, _ = env.reset()
+            observations[index] = observation
+            rewards[index] = reward
+            dones[index] = done
+            remote.send(None)
+        elif command == "reset":
+            observation, _ = env.reset(seed=data)
+            observations[index] = observation
+            remote.send(None)
+        elif command == "get_attr":
+            try:
+                remote.send((True, getattr(env, data)))
+            except AttributeError as error:
+                remote.send((False, error))
+        elif command == "has_attr":
+            remote.send(hasattr(env, data))
+        elif command == "set_attr":
+            setattr(env, data[0], data[1])
+            remote.send(None)
+        elif command == "env_method":
+            name, args, kwargs = data
+            remote.send(getattr(env, name)(*args, **kwargs))
+        elif command == "close":
+            env.close()
+            remote.close()
+            break
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Vector env running every `TankEnv` in its own process.
+
+    Actions, observations, rewards and done flags are exchanged through preallocated shared
+    memory buffers, the pipes only carry short commands. Defaults to the "fork" start method,
+    so training scripts without a `__main__` guard can create it.
+
+    With an `OpponentPool` the envs' opponent seats (`TankEnv` opponent_seats) are played by its
+    frozen policies. Before each step the opponent tank actions of all envs are made in rounds,
+    each round runs one batched forward pass per policy over the seats waiting in every worker.
+    """
+
+    def __init__(self, env_fns, start_method: str = "fork", opponent_pool=None):
+        num_envs = len(env_fns)
+        env = env_fns[0]()
+        observation_space = env.observation_space
+        action_space = env.action_space
+        opponent_seats = getattr(env, "opponent_seats", ())
+        env.close()
+        if bool(opponent_seats) != (opponent_pool is not None):
+            raise ValueError("Envs with opponent seats need an opponent pool and vice versa")
+        self.opponent_pool = opponent_pool
+        # Pool policy playing each seat of each env, drawn again when its game ends
+        self.seat_policies = np.full((num_envs, max(opponent_seats, default=0) + 1), -1)
+        self.opponent_seats = list(opponent_seats)
+        observation_shape = observation_space.shape
+        observation_size = int(np.prod(observation_shape))
+
+        self.buffers = {
+            "observations": mp.RawArray("i", num_envs * observation_size),
+            "terminal_observations": mp.RawArray("i", num_envs * observation_size),
+            "rewards": mp.RawArray("f", num_envs),
+            "dones": mp.RawArray("b", num_envs),
+            "actions": mp.RawArray("q", num_envs),
+            "opponent_observations": mp.RawArray("i", num_envs * observation_size),
+            "waiting_seats": mp.RawArray("i", num_envs),
+            "opponent_actions": mp.RawArray("q", num_envs),
+            "opponent_masks": mp.RawArray("b", num_envs * int(action_space.n)),
+        }
+        shape = (num_envs, *observation_shape)
+        self.observations = _buffer_view(self.buffers["observations"], np.int32, shape)
+        self.terminal_observations = _buffer_view(
+            self.buffers["terminal_observations"], np.int32, shape
+        )
+        self.rewards = _buffer_view(self.buffers["rewards"], np.float32, (num_envs,))
+        self.dones = _buffer_view(self.buffers["dones"], np.bool_, (num_envs,))
+        self.actions = _buffer_view(self.buffers["actions"], np.int64, (num_envs,))
+        self.opponent_observations = _buffer_view(
+            self.buffers["opponent_observations"], np.int32, shape
+        )
+        # Opponent seat each env waits for, -1 when it waits for the learner or is done
+        self.waiting_seats = _buffer_view(self.buffers["waiting_seats"], np.int32, (num_envs,))
+        self.opponent_actions = _buffer_view(
+            self.buffers["opponent_actions"], np.int64, (num_envs,)
+        )
+        # Action masks of the waiting seats, only written when the pool uses action masks
+        self.opponent_masks = _buffer_view(
+            self.buffers["opponent_masks"], np.bool_, (num_envs, action_space.n)
+        )
+        write_masks = opponent_pool is not None and opponent_pool.use_action_masks
+
+        context = mp.get_context(start_method)
+        self.remotes, self.work_remotes = zip(*[context.Pipe() for _ in range(num_envs)])
+        self.processes = []
+        for index, (work_remote, remote, env_fn) in enumerate(
+            zip(self.work_remotes, self.remotes, env_fns)
+        ):
+            process = context.Process(
+                target=_worker,
+                args=(
+                    work_remote,
+                    remote,
+                    index,
+                    env_fn,
+                    self.buffers,
+                    observation_shape,
+                    write_masks,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+        self.closed = False
+        super().__init__(num_envs, observation_space, action_space)
+
+    def reset(self) -> np.ndarray:
+        for remote, seed in zip(self.remotes, self._seeds):
+            remote.send(("reset", seed))
+        for remote in self.remotes:
+            remote.recv()
+        self._reset_seeds()
+        if self.opponent_pool is not None:
+            self.draw_seat_policies(np.arange(self.num_envs))
+        return self.observations.copy()
+
+    def step_async(self, actions: np.ndarray):
+        self.actions[:] = np.asarray(actions).reshape(self.num_envs)
+        if self.opponent_pool is None:
+            for remote in self.remotes:
+                remote.send(("step", None))
+
+    def step_wait(self):
+        if self.opponent_pool is not None:
+            self.play_opponents()
+            for remote in self.remotes:
+                remote.send(("step", None))
+        for remote in self.remotes:
+            remote.recv()
+        dones = self.dones.copy()
+        if self.opponent_pool is not None and dones.any():
+            self.draw_seat_policies(np.nonzero(dones)[0])
+        infos = [{} for _ in range(self.num_envs)]
+        for index in np.nonzero(dones)[0]:
+            infos[index]["terminal_observation"] = self.terminal_observations[index].copy()
+            infos[index]["TimeLimit.truncated"] = False
+        return self.observations.copy(), self.rewards.copy(), dones, infos
+
+    def draw_seat_policies(self, envs: np.ndarray):
+        for seat in self.opponent_seats:
+            self.seat_policies[envs, seat] = self.opponent_pool.draw(len(envs))
+
+    def play_opponents(self):
+        """Make opponent seat actions in all envs until every env waits for the learner."""
+        for remote in self.remotes:
+            remote.send(("advance", None))
+        for remote in self.remotes:
+            remote.recv()
+        while True:
+            waiting = np.nonzero(self.waiting_seats >= 0)[0]
+            if len(waiting) == 0:
+                break
+            self.opponent_actions[waiting] = self.opponent_pool.predict(
+                self.opponent_observations[waiting],
+                self.seat_policies[waiting, self.waiting_seats[waiting]],
+                self.opponent_masks[waiting],
+            )
+            for index in waiting:
+                self.remotes[index].send(("step_opponent", None))
+            for index in waiting:
+                self.remotes[index].recv()
+
+    def close(self):
+        if self.closed:
+            return
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def _remotes_for(self, indices):
+        return [self.remotes[index] for index in self._get_indices(indices)]
+
+    def get_attr(self, attr_name, indices=None):
+        remotes = self._remotes_for(indices)
+        for remote in remotes:
+            remote.send(("get_attr", attr_name))
+        results = [remote.recv() for remote in remotes]
+        for found, value in results:
+            if not found:
+                raise value
+        return [value for _, value in results]
+
+    def has_attr(self, attr_name) -> bool:
+        """Check in the workers, `VecEnv.has_attr` would send the attribute through the pipes."""
+        for remote in self.remotes:
+            remote.send(("has_attr", attr_name))
+        return all([remote.recv() for remote in self.remotes])
+
+    def set_attr(self, attr_name, value, indices=None):
+        remotes = self._remotes_for(indices)
+        for remote in remotes:
+            remote.send(("set_attr", (attr_name, value)))
+        for remote in remotes:
+            remote.recv()
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        remotes = self._remotes_for(indices)
+        for remote in remotes:
+            remote.send(("env_method", (method_name, method_args, method_kwargs)))
+        return [remote.recv() for remote in remotes]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
@@ -1,6 +1,9 @@
 from stable_baselines3 import PPO
 import os
 from tankenv import TankEnv
+from batched_env import BatchedTankVecEnv
+from shared_vec_env import SharedMemoryVecEnv
+from self_play import OpponentPool
 import time
 
 models_dir = f"models/{int(time.time())}/"
@@ -12,16 +15,58 @@ if not os.path.exists(models_dir):
 if not os.path.exists(logdir):
     os.makedirs(logdir)
 
-env = TankEnv(False)
-env.reset()
+# Matches simulated together by BatchedTankVecEnv (greedy vectorized opponents), 0 trains on one TankEnv
+BATCHED_GAMES = 0
+# TankEnv worker processes, 0 trains on one TankEnv in this process
+NUM_WORKERS = 0
+# Checkpoints playing seats 1 and 2 instead of the scripted bots (self-play, needs NUM_WORKERS)
+SELF_PLAY_CHECKPOINTS = []
+# Train with MaskablePPO so only actions that do something are sampled (needs sb3-contrib)
+USE_ACTION_MASKS = False
+# Log where env time goes (bot planning, pathfinding, shooting, ...) to TensorBoard
+PROFILE_PHASES = False
 
-model = PPO("MlpPolicy", env, verbose=1, tensorboard_log=logdir)
+callback = None
+if PROFILE_PHASES:
+    from profiling import PhaseTimingCallback, phase_timers
+
+    # Before creating the env, so worker processes time their phases too
+    phase_timers.enable()
+    callback = PhaseTimingCallback()
+
+if BATCHED_GAMES > 0:
+    env = BatchedTankVecEnv(BATCHED_GAMES)
+elif NUM_WORKERS > 0:
+    opponent_pool = None
+    opponent_seats = ()
+    if SELF_PLAY_CHECKPOINTS:
+        opponent_pool = OpponentPool.load(
+            SELF_PLAY_CHECKPOINTS, use_action_masks=USE_ACTION_MASKS
+        )
+        opponent_seats = (1, 2)
+    env = SharedMemoryVecEnv(
+        [lambda: TankEnv(False, opponent_seats=opponent_seats)] * NUM_WORKERS,
+        opponent_pool=opponent_pool,
+    )
+else:
+    env = TankEnv(False)
+    env.reset()
+
+if USE_ACTION_MASKS:
+    from sb3_contrib import MaskablePPO
+
+    model = MaskablePPO("MlpPolicy", env, verbose=1, tensorboard_log=logdir)
+else:
+    model = PPO("MlpPolicy", env, verbose=1, tensorboard_log=logdir)
 
 TIMESTEPS = 10000
 iters = 0
 while True:
     iters += 1
     model.learn(
-        total_timesteps=TIMESTEPS, reset_num_timesteps=False, tb_log_name=f"PPO"
+        total_timesteps=TIMESTEPS,
+        reset_num_timesteps=False,
+        callback=callback,
+        tb_log_name="MaskablePPO" if USE_ACTION_MASKS else "PPO",
     )
     model.save(f"{models_dir}/{TIMESTEPS*iters}")
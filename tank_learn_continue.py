@@ -1,13 +1,37 @@
 from stable_baselines3 import PPO
 from tankenv import TankEnv
+from shared_vec_env import SharedMemoryVecEnv
 import time
 
 models_dir = "models/1715365876"
 logdir = f"logs/{int(time.time())}/"  # tensorboard --logdir ./PPO_0
 
-env = TankEnv(False)
+# TankEnv worker processes, 0 trains on one TankEnv in this process
+NUM_WORKERS = 0
+# Set when the model was trained with MaskablePPO (needs sb3-contrib)
+USE_ACTION_MASKS = False
+# Log where env time goes (bot planning, pathfinding, shooting, ...) to TensorBoard
+PROFILE_PHASES = False
+
+callback = None
+if PROFILE_PHASES:
+    from profiling import PhaseTimingCallback, phase_timers
+
+    # Before creating the env, so worker processes time their phases too
+    phase_timers.enable()
+    callback = PhaseTimingCallback()
+
+if NUM_WORKERS > 0:
+    env = SharedMemoryVecEnv([lambda: TankEnv(False)] * NUM_WORKERS)
+else:
+    env = TankEnv(False)
 model_path = f"{models_dir}/4730000.zip"
-model = PPO.load(model_path, env=env)
+if USE_ACTION_MASKS:
+    from sb3_contrib import MaskablePPO
+
+    model = MaskablePPO.load(model_path, env=env)
+else:
+    model = PPO.load(model_path, env=env)
 model.set_env(env)
 
 TIMESTEPS = 10000
@@ -15,6 +39,9 @@ iters = 0
 while True:
     iters += 1
     model.learn(
-        total_timesteps=TIMESTEPS, reset_num_timesteps=False, tb_log_name=f"PPO"
+        total_timesteps=TIMESTEPS,
+        reset_num_timesteps=False,
+        callback=callback,
+        tb_log_name="MaskablePPO" if USE_ACTION_MASKS else "PPO",
     )
     model.save(f"{models_dir}/{TIMESTEPS*iters}")
@@ -1,6 +1,7 @@
 from stable_baselines3 import PPO
 from tankenv import TankEnv
 
+# Watch a trained model play, to compare checkpoints run evaluate.py
 models_dir = "models/1715970412"
 
 env = TankEnv(True)
@@ -9,13 +10,14 @@ env.reset()
 model_path = f"{models_dir}/1200000.zip"
 model = PPO.load(model_path, env=env)
 
-episodes = 500
+episodes = 5
 
 for ep in range(episodes):
-    vec_env = model.get_env()
-    obs = vec_env.reset()
+    obs, info = env.reset()
     done = False
+    episode_reward = 0
     while not done:
         action, _states = model.predict(obs)
         obs, rewards, done, truncated, info = env.step(action)
-        print(rewards)
+        episode_reward += rewards
+    print(f"Episode {ep} reward {episode_reward}")
@@ -6,15 +6,172 @@ from game import *
 from player import *
 from vehicle import *
 
+# Observed values per vehicle: q, r, owner, vehicle index, hp, speed points, capture points
+VEHICLE_OBSERVATION_SIZE = 7
+# Axial coordinate transforms of a 60 degree rotation and of swapping q and r
+ROTATION_MATRIX = np.array([[0, -1], [1, 1]])
+REFLECTION_MATRIX = np.array([[0, 1], [1, 0]])
+
+
+class SeatFrame:
+    """
+    How a seat sees the game when it plays with a policy trained on seat 0: the map is rotated
+    (or mirrored) so the seat's vehicles start where seat 0's do, and players are renumbered
+    to match the players starting there.
+
+    Symmetries that also keep the static tiles (obstacles, capture area, stations, catapults)
+    in place are preferred. The stations and catapults are only 3-fold symmetric, so with other
+    player counts a symmetry of the spawns alone is used, and when there is none either the map
+    is not transformed and only the players are renumbered, starting from the seat.
+    """
+
+    def __init__(self, game: Game, seat: int):
+        spawns = {
+            (vehicle.owning_player.index, vehicle.vehicleIndex): vehicle.spawn_position
+            for vehicle in game.vehicles
+        }
+        num_players = len(game.players)
+        static_tiles = [
+            game.obstacles,
+            game.capture_area,
+            game.light_repair_stations,
+            game.heavy_repair_stations,
+            game.catapults,
+        ]
+        matches = [
+            (matrix, players)
+            for matrix in self.symmetries()
+            if (players := self.match_spawns(spawns, matrix, seat, num_players))
+        ]
+        for matrix, players in matches:
+            if all(
+                {self.transform(matrix, tile) for tile in tiles} == set(tiles)
+                for tiles in static_tiles
+            ):
+                break
+        else:
+            if matches:
+                matrix, players = matches[0]
+            else:
+                matrix = np.identity(2, dtype=int)
+                players = [(seat + player) % num_players for player in range(num_players)]
+
+        self.matrix = matrix
+        self.players = np.array(players)
+        self.owners = np.argsort(self.players)  # Player -> number seen by the seat
+        # Row j of the seat's observation shows the world vehicle in row rows[j]
+        rows = {
+            (vehicle.owning_player.index, vehicle.vehicleIndex): row
+            for row, vehicle in enumerate(game.vehicles)
+        }
+        self.rows = np.array(
+            [
+                rows[(players[vehicle.owning_player.index], vehicle.vehicleIndex)]
+                for vehicle in game.vehicles
+            ]
+        )
+        # Action chosen by the seat -> the same action on the real map
+        self.world_actions = np.arange(SHOOT_ACTION + 1)
+        for action, direction in enumerate(ACTION_DIRECTIONS):
+            seat_action = ACTIONS_BY_DIRECTION[self.transform(matrix, direction)]
+            self.world_actions[seat_action] = action
+
+    @staticmethod
+    def symmetries() -> list[np.ndarray]:
+        """The 12 rotations and reflections of the hexagonal map, identity first."""
+        matrices = []
+        for reflection in (np.identity(2, dtype=int), REFLECTION_MATRIX):
+            matrix = reflection
+            for _ in range(6):
+                matrices.append(matrix)
+                matrix = ROTATION_MATRIX @ matrix
+        return matrices
+
+    @staticmethod
+    def transform(matrix: np.ndarray, tile: tuple[int, int]) -> tuple[int, int]:
+        return (
+            int(matrix[0, 0] * tile[0] + matrix[0, 1] * tile[1]),
+            int(matrix[1, 0] * tile[0] + matrix[1, 1] * tile[1]),
+        )
+
+    @classmethod
+    def match_spawns(cls, spawns, matrix, seat, num_players) -> list[int] | None:
+        """
+        Players seen as each player under the transform, None unless it moves the seat's
+        vehicles exactly onto the spawn tiles of seat 0's same vehicles.
+        """
+        # players[p] is the player seen as player p
+        players = [
+            cls.find_player(spawns, matrix, player, num_players)
+            for player in range(num_players)
+        ]
+        if players[0] != seat or None in players:
+            return None
+        if any(
+            cls.transform(matrix, spawns[(seat, index)]) != position
+            for (owner, index), position in spawns.items()
+            if owner == 0
+        ):
+            return None
+        return players
+
+    @classmethod
+    def find_player(cls, spawns, matrix, player, num_players) -> int | None:
+        """Player whose spawn tiles the transform moves onto the spawn tiles of player."""
+        player_spawns = {
+            position for (owner, _), position in spawns.items() if owner == player
+        }
+        for candidate in range(num_players):
+            if player_spawns == {
+                cls.transform(matrix, position)
+                for (owner, _), position in spawns.items()
+                if owner == candidate
+            }:
+                return candidate
+        return None
+
 
 class TankEnv(gym.Env):
     """Custom Environment that follows gym interface"""
 
-    def __init__(self, use_gui):
+    metadata = {"render_modes": ["human", "rgb_array"]}
+
+    def __init__(
+        self,
+        use_gui,
+        observe_capture_distance=False,
+        render_mode=None,
+        render_every=1,
+        opponent_seats=(),
+        map_radius=MAP_RADIUS,
+        num_players=NUM_PLAYERS,
+        squad=DEFAULT_SQUAD,
+    ):
         super(TankEnv, self).__init__()
+        self.map_radius = map_radius
+        self.num_players = num_players
+        self.squad = list(squad)
+        # Seats played by `PolicyPlayer`s whose actions come from `step_opponent` (self-play)
+        self.opponent_seats = tuple(opponent_seats)
+        self.pending_reward = 0
+        # "human" draws into the window, "rgb_array" into an offscreen surface returned by
+        # `render`. Unlike use_gui, the map isn't drawn after every single tank action.
+        self.render_mode = render_mode
+        # In "human" mode the map is drawn every this many steps (0: only when `render` is called)
+        self.render_every = render_every
+        self.num_steps = 0
         self.action_space = spaces.Discrete(37)
+        # Optionally add every vehicle's capture distance field value to the observation
+        self.observe_capture_distance = observe_capture_distance
+        # Vehicles, kill points, neutrality matrix, current player and tank (119 by default)
+        num_vehicles = num_players * len(self.squad)
+        observation_size = (
+            VEHICLE_OBSERVATION_SIZE * num_vehicles + num_players + num_players**2 + 2
+        )
+        if observe_capture_distance:
+            observation_size += num_vehicles
         self.observation_space = spaces.Box(
-            low=-500, high=500, shape=(119,), dtype=np.int32
+            low=-500, high=500, shape=(observation_size,), dtype=np.int32
         )
         self.use_gui = use_gui
 
@@ -23,13 +180,19 @@ class TankEnv(gym.Env):
         Gym function of a single timestep of the environment
         """
         info = {}
-        self.total_reward = 0
+        # Rewards of opponent seat actions since the last step count for this step
+        self.total_reward = self.pending_reward
+        self.pending_reward = 0
 
         # While non reinforcement learning player, make actions with other players
         while (
             self.game.current_index != self.reinfocement_learning_player_index
             and self.game.done != True
         ):
+            if self.game.current_index in self.opponent_seats:
+                raise RuntimeError(
+                    f"Seat {self.game.current_index} is waiting for `step_opponent`"
+                )
             self.total_reward += self.game.make_game_action(action)
 
         # If game is done, return observation and reward
@@ -37,7 +200,8 @@ class TankEnv(gym.Env):
             self.prepare_observation()
             self.reward = self.total_reward
             self.prev_reward = self.total_reward
-            return self.observation, self.reward, self.game.done, False, info
+            self.render_if_due()
+            return self.observation.copy(), self.reward, self.game.done, False, info
 
         # If reinforcement learning player, make action and return observation and reward
         if (
@@ -47,7 +211,114 @@ class TankEnv(gym.Env):
             self.prepare_observation()
             self.reward = self.total_reward  # Calculate reward
             self.prev_reward = self.total_reward
-            return self.observation, self.reward, self.game.done, False, info
+            self.render_if_due()
+            return self.observation.copy(), self.reward, self.game.done, False, info
+
+    def render_if_due(self):
+        self.num_steps += 1
+        if (
+            self.render_mode == "human"
+            and self.render_every > 0
+            and self.num_steps % self.render_every == 0
+        ):
+            self.render()
+
+    def render(self) -> np.ndarray | None:
+        """
+        Draw the current game state. In "rgb_array" mode it is returned as an array of
+        shape (height, width, 3), copied once out of the offscreen surface.
+        """
+        if self.render_mode is None:
+            return None
+        offscreen = self.render_mode == "rgb_array"
+        gui = self.game.get_gui(offscreen)
+        gui.draw_hexagonal_map(self.game)
+        if offscreen:
+            import pygame
+
+            return np.transpose(pygame.surfarray.array3d(gui.screen), axes=(1, 0, 2))
+        return None
+
+    def action_masks(self) -> np.ndarray:
+        """
+        Actions that do something for the reinforcement learning player's current tank,
+        used by MaskablePPO. All actions are allowed when it is not that player's turn.
+        """
+        if (
+            self.game.done
+            or self.game.current_index != self.reinfocement_learning_player_index
+        ):
+            return np.ones(self.action_space.n, dtype=bool)
+        player = self.game.players[self.game.current_index]
+        return self.game.get_action_mask(
+            player.vehicles[self.game.current_tank_index]
+        )
+
+    def play_until_decision(self):
+        """Let scripted seats act until the learning player or an opponent seat has to choose."""
+        while (
+            not self.game.done
+            and self.game.current_index != self.reinfocement_learning_player_index
+            and self.game.current_index not in self.opponent_seats
+        ):
+            self.pending_reward += self.game.make_game_action()
+
+    def opponent_to_act(self) -> int:
+        """Opponent seat that has to choose an action, -1 if none."""
+        if not self.game.done and self.game.current_index in self.opponent_seats:
+            return self.game.current_index
+        return -1
+
+    def get_seat_observation(self, seat: int) -> np.ndarray:
+        """Current observation as seen by seat, laid out like the learning player's."""
+        self.prepare_observation()
+        frame = self.seat_frames[seat]
+        vehicles = self.vehicle_observation[frame.rows]
+        vehicles[:, :2] = vehicles[:, :2] @ frame.matrix.T
+        vehicles[:, 2] = frame.owners[vehicles[:, 2]]
+        return np.concatenate(
+            [
+                vehicles.ravel(),
+                self.kill_points_observation[frame.players],
+                self.neutrality_observation[np.ix_(frame.players, frame.players)].ravel(),
+                [frame.owners[self.turn_observation[0]], self.turn_observation[1]],
+            ]
+            + (
+                [self.capture_distance_observation[frame.rows]]
+                if self.observe_capture_distance
+                else []
+            )
+        ).astype(np.int32)
+
+    def get_seat_action_mask(self, seat: int) -> np.ndarray:
+        """`action_masks` of the seat's current tank, in the actions of `get_seat_observation`."""
+        frame = self.seat_frames[seat]
+        player = self.game.players[seat]
+        mask = self.game.get_action_mask(player.vehicles[self.game.current_tank_index])
+        return mask[frame.world_actions]
+
+    def step_opponent(self, action: int):
+        """
+        Make the action the current opponent seat chose from its `get_seat_observation`, then let
+        scripted seats act until the next decision.
+        """
+        seat = self.opponent_to_act()
+        if seat < 0:
+            raise RuntimeError("No opponent seat is waiting for an action")
+        world_action = int(self.seat_frames[seat].world_actions[action])
+        self.pending_reward += self.game.make_game_action(world_action)
+        self.play_until_decision()
+
+    def pop_phase_times(self) -> dict[str, float]:
+        """Phase times of this process since the last call, for `PhaseTimingCallback`."""
+        # Imported here, profiling depends on this module
+        from profiling import phase_timers
+
+        return phase_timers.pop()
+
+    def pop_plan_cache_counts(self) -> tuple[int, int]:
+        """Scripted bot plan cache hits and misses of this process since the last call."""
+        return Player.plan_cache.pop_counts()
 
     def reset(self, seed=None, options=None):
         """
@@ -55,53 +326,87 @@ class TankEnv(gym.Env):
         """
         info = {}
         self.prev_reward = 0
+        self.pending_reward = 0
         self.reinfocement_learning_player_index = 0
-        self.player0 = ReinforcementLearningPlayer(
-            "Player1", RED, self.reinfocement_learning_player_index
-        )
-        self.player1 = Player("Player2", GREEN, 1)
-        self.player2 = Player("Player3", BLUE, 2)
+        self.players = [
+            ReinforcementLearningPlayer(
+                "Player1", PLAYER_COLORS[0], self.reinfocement_learning_player_index
+            )
+        ]
+        for index in range(1, self.num_players):
+            player_class = PolicyPlayer if index in self.opponent_seats else Player
+            color = PLAYER_COLORS[index % len(PLAYER_COLORS)]
+            self.players.append(player_class(f"Player{index + 1}", color, index))
 
         self.reset_state()
         self.prepare_observation()
 
-        return self.observation, info
+        return self.observation.copy(), info
 
-    def prepare_observation(self):
+    def setup_observation(self):
         """
-        Prepares the observation space for the reinforcement learning agent
+        Allocates the int32 observation buffer for a new game. Every field has a fixed slot,
+        values that can't change during a game (owner, vehicle index, speed points) are written once.
         """
-        observation = []
-        # Add all vehicle data to observation space
-        for vehicle in self.game.vehicles:
-            observation.extend(vehicle.position)
-            observation.append(vehicle.owning_player.index)
-            observation.append(vehicle.vehicleIndex)
-            observation.append(vehicle.hp)
-            observation.append(vehicle.sp)
-            observation.append(vehicle.capture_points)
+        vehicles = self.game.vehicles
+        num_vehicles = len(vehicles)
+        num_players = len(self.game.players)
+        self.observation = np.zeros(self.observation_space.shape, dtype=np.int32)
 
-        # Add player data to observation space
-        for player in self.game.players:
-            observation.append(player.kill_points)
+        vehicles_end = VEHICLE_OBSERVATION_SIZE * num_vehicles
+        self.vehicle_observation = self.observation[:vehicles_end].reshape(
+            num_vehicles, VEHICLE_OBSERVATION_SIZE
+        )
+        neutrality_start = vehicles_end + num_players
+        neutrality_end = neutrality_start + num_players * num_players
+        self.kill_points_observation = self.observation[vehicles_end:neutrality_start]
+        self.neutrality_observation = self.observation[
+            neutrality_start:neutrality_end
+        ].reshape(num_players, num_players)
+        self.turn_observation = self.observation[neutrality_end : neutrality_end + 2]
+        self.capture_distance_observation = self.observation[neutrality_end + 2 :]
 
-        # Flatten the neutrality matrix and add it to the observation space
-        neutrality_matrix_flat = np.array(self.game.neutrality_matrix).flatten()
-        observation.extend(neutrality_matrix_flat)
+        for vehicle, row in zip(vehicles, self.vehicle_observation):
+            row[2] = vehicle.owning_player.index
+            row[3] = vehicle.vehicleIndex
+            row[5] = vehicle.sp
 
-        # Add the current index and current tank index to the observation space
-        observation.append(self.game.current_index)
-        observation.append(self.game.current_tank_index)
+    def prepare_observation(self):
+        """
+        Prepares the observation space for the reinforcement learning agent.
+        Refreshes the changing slots of the observation buffer in place.
+        """
+        # Game keeps vehicle i in slot i of its store, so the columns are plain array copies
+        store = self.game.vehicle_store
+        num_vehicles = len(self.vehicle_observation)
+        self.vehicle_observation[:, 0] = store.q[:num_vehicles]
+        self.vehicle_observation[:, 1] = store.r[:num_vehicles]
+        self.vehicle_observation[:, 4] = store.hp[:num_vehicles]
+        self.vehicle_observation[:, 6] = store.capture_points[:num_vehicles]
 
-        self.observation = observation
-        self.observation = np.array(self.observation)
+        for index, player in enumerate(self.game.players):
+            self.kill_points_observation[index] = player.kill_points
+        self.neutrality_observation[:] = self.game.neutrality_matrix
+
+        self.turn_observation[0] = self.game.current_index
+        self.turn_observation[1] = self.game.current_tank_index
+
+        if self.observe_capture_distance:
+            self.capture_distance_observation[:] = self.game.get_capture_distances()
 
     def reset_state(self):
         """
         Resets the game state
         """
         self.reinfocement_learning_player_index = 0
-        self.game = Game(self.use_gui, self.reinfocement_learning_player_index)
-        self.game.setup()
-        self.game.players = [self.player0, self.player1, self.player2]
+        self.game = Game(
+            self.use_gui,
+            self.reinfocement_learning_player_index,
+            self.map_radius,
+            self.squad,
+        )
+        self.game.players = self.players
         self.game.place_vehicles(self.game.players)
+        self.game.setup()  # After placing, the GUI outlines the vehicles' spawn tiles
+        self.setup_observation()
+        self.seat_frames = {seat: SeatFrame(self.game, seat) for seat in self.opponent_seats}
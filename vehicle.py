@@ -1,102 +1,149 @@
 from constants import *
 from hex_utility import *
+from vehicle_store import *
 
 
 class Vehicle:
+    """
+    View of one vehicle in a `VehicleStore`. Numeric state lives in the store arrays,
+    static stats come from `VEHICLE_TYPE_STATS`.
+    """
+
     def __init__(
-        self,
-        owning_player,
-        v_type,
-        spawn_position,
-        vehicleIndex,
-        hp,
-        sp,
-        damage,
-        destruction_points,
-        shooting_range,
+        self, owning_player, v_type, spawn_position, vehicleIndex, store=None
     ):
         self.owning_player = owning_player
         self.vehicleIndex = vehicleIndex
         self.type = v_type
-        self.position = spawn_position
-        self.spawn_position = spawn_position
-        self.hp = hp
-        self.spawn_hp = hp
-        self.sp = sp
-        self.damage = damage
-        self.destruction_points = destruction_points
-        self.shooting_range = shooting_range
-        self.capture_points = 0
+        if store is None:
+            store = VehicleStore(1)
+        self.store = store
+        self.slot = store.add(owning_player.index, v_type, spawn_position)
+        stats = VEHICLE_TYPE_STATS[v_type]
+        self.spawn_hp = stats[0]
+        self.damage = stats[2]
+        self.destruction_points = stats[3]
+        self.shooting_range = stats[4]
         self.reserved_move = ()
         self.gui_last_move = ()  # Only for GUI
-        self.shooting_range_bonus = False
+        self.board = None  # Set when the vehicle is added to a game
+
+    def move_to_store(self, store: VehicleStore):
+        """Move vehicle state into another store (e.g. the one of the game it is added to)."""
+        self.slot = store.copy_slot(self.store, self.slot)
+        self.store = store
+
+    @property
+    def position(self) -> tuple[int, int]:
+        return (int(self.store.q[self.slot]), int(self.store.r[self.slot]))
+
+    @position.setter
+    def position(self, position: tuple[int, int]):
+        self.store.q[self.slot] = position[0]
+        self.store.r[self.slot] = position[1]
+
+    @property
+    def spawn_position(self) -> tuple[int, int]:
+        return (int(self.store.spawn_q[self.slot]), int(self.store.spawn_r[self.slot]))
+
+    @property
+    def hp(self) -> int:
+        return int(self.store.hp[self.slot])
+
+    @hp.setter
+    def hp(self, hp: int):
+        self.store.hp[self.slot] = hp
+
+    @property
+    def sp(self) -> int:
+        return int(self.store.sp[self.slot])
+
+    @sp.setter
+    def sp(self, sp: int):
+        self.store.sp[self.slot] = sp
+
+    @property
+    def capture_points(self) -> int:
+        return int(self.store.capture_points[self.slot])
+
+    @capture_points.setter
+    def capture_points(self, capture_points: int):
+        self.store.capture_points[self.slot] = capture_points
+
+    @property
+    def shooting_range_bonus(self) -> bool:
+        return bool(self.store.range_bonus[self.slot])
+
+    @shooting_range_bonus.setter
+    def shooting_range_bonus(self, shooting_range_bonus: bool):
+        self.store.range_bonus[self.slot] = shooting_range_bonus
 
     def get_shootable_hexes(self, position=None):
         if position == None:
             position = self.position
-        hexes = cube_ring(position, self.shooting_range)
+        hexes = self.board.ring(position, self.shooting_range)
         if self.shooting_range_bonus:
-            hexes.extend(cube_ring(position, self.shooting_range + 1))
-        list = []
-        list.append(hexes)
-        return list
+            hexes = hexes + self.board.ring(position, self.shooting_range + 1)
+        return [hexes]
 
-    def get_shootable_vehicles(self, obstacles, vehicles, attack_matrix, position=None):
+    def get_attack_template(self, position=None):
+        """Precomputed hexes this vehicle can shoot at from position, shared per board."""
+        if position is None:
+            position = self.position
+        key = (position, self.type, self.shooting_range_bonus)
+        template = self.board.attack_templates.get(key)
+        if template is None:
+            template = self.build_attack_template(position)
+            self.board.attack_templates[key] = template
+        return template
+
+    def build_attack_template(self, position):
+        return self.get_shootable_hexes(position)[0]
+
+    def get_shootable_vehicles(self, obstacles, vehicle_map, may_attack, position=None):
+        """Enemy vehicles in range, may_attack is the `Game.may_attack` table."""
+        targets = may_attack[self.owning_player.index]
         results = []
-        if position:
-            target_lists = self.get_shootable_hexes(position)
-        else:
-            target_lists = self.get_shootable_hexes()
-        for targets in target_lists:
-            for shootable_hex in targets:
-                for enemy_vehicle in vehicles:
-                    if (
-                        enemy_vehicle.position == shootable_hex
-                        and enemy_vehicle.owning_player != self.owning_player
-                        and check_neutrality(
-                            self.owning_player.index,
-                            enemy_vehicle.owning_player.index,
-                            attack_matrix,
-                        )
-                    ):
-                        results.append((enemy_vehicle.position, [enemy_vehicle]))
+        for shootable_hex in self.get_attack_template(position):
+            for enemy_vehicle in vehicle_map.get(shootable_hex, ()):
+                if targets >> enemy_vehicle.owning_player.index & 1:
+                    results.append((enemy_vehicle.position, [enemy_vehicle]))
         return results
 
 
 class Light_Tank(Vehicle):
-    def __init__(self, owning_player, spawn_position, vehicleIndex):
+    def __init__(self, owning_player, spawn_position, vehicleIndex, store=None):
         super().__init__(
-            owning_player, LIGHT_TANK, spawn_position, vehicleIndex, 1, 3, 1, 1, 2
+            owning_player, LIGHT_TANK, spawn_position, vehicleIndex, store
         )
 
 
 class Medium_Tank(Vehicle):
-    def __init__(self, owning_player, spawn_position, vehicleIndex):
+    def __init__(self, owning_player, spawn_position, vehicleIndex, store=None):
         super().__init__(
-            owning_player, MEDIUM_TANK, spawn_position, vehicleIndex, 2, 2, 1, 2, 2
+            owning_player, MEDIUM_TANK, spawn_position, vehicleIndex, store
         )
 
 
 class Heavy_Tank(Vehicle):
-    def __init__(self, owning_player, spawn_position, vehicleIndex):
+    def __init__(self, owning_player, spawn_position, vehicleIndex, store=None):
         super().__init__(
-            owning_player, HEAVY_TANK, spawn_position, vehicleIndex, 3, 1, 1, 3, 1
+            owning_player, HEAVY_TANK, spawn_position, vehicleIndex, store
         )
 
-    def get_shootable_hexes(self):
-        hexes = cube_ring(self.position, self.shooting_range)
-        hexes = cube_ring(self.position, self.shooting_range + 1)
+    def get_shootable_hexes(self, position=None):
+        if position == None:
+            position = self.position
+        hexes = self.board.ring(position, self.shooting_range + 1)
         if self.shooting_range_bonus:
-            hexes.extend(cube_ring(self.position, self.shooting_range + 1 + 1))
-        list = []
-        list.append(hexes)
-        return list
+            hexes = hexes + self.board.ring(position, self.shooting_range + 1 + 1)
+        return [hexes]
 
 
 class Tank_Destroyer(Vehicle):
-    def __init__(self, owning_player, spawn_position, vehicleIndex):
+    def __init__(self, owning_player, spawn_position, vehicleIndex, store=None):
         super().__init__(
-            owning_player, TANK_DESTROYER, spawn_position, vehicleIndex, 2, 1, 1, 2, 3
+            owning_player, TANK_DESTROYER, spawn_position, vehicleIndex, store
         )
 
     def get_shootable_hexes(self, position=None):
@@ -122,39 +169,41 @@ class Tank_Destroyer(Vehicle):
             (position[0] + radius, position[1] - radius),
         ]
 
-    def get_shootable_vehicles(self, obstacles, vehicles, attack_matrix, position=None):
-        results = []
-        if position:
-            shootable_hexes_by_direction_vector = self.get_shootable_hexes(position)
-        else:
-            shootable_hexes_by_direction_vector = self.get_shootable_hexes()
+    def build_attack_template(self, position):
+        """One (first hex, hexes up to the first obstacle) entry per direction."""
+        length = self.shooting_range + int(self.shooting_range_bonus)
+        return tuple(
+            (entry_hex, self.board.ray(position, direction, length))
+            for entry_hex, direction in zip(
+                self.star_shape(position, 1), self.star_shape((0, 0), 1)
+            )
+        )
 
-        for one_direction_shootable_hexes in shootable_hexes_by_direction_vector:
+    def get_shootable_vehicles(self, obstacles, vehicle_map, may_attack, position=None):
+        targets = may_attack[self.owning_player.index]
+        results = []
+        for entry_hex, hexes in self.get_attack_template(position):
             vehicles_in_direction = []
-            for hexagon in one_direction_shootable_hexes:
-                if hexagon in obstacles:
-                    break
-                else:
-                    for enemy_vehicle in vehicles:
-                        if (
-                            enemy_vehicle.position == hexagon
-                            and enemy_vehicle.owning_player != self.owning_player
-                            and check_neutrality(
-                                self.owning_player.index,
-                                enemy_vehicle.owning_player.index,
-                                attack_matrix,
-                            )
-                        ):
-                            vehicles_in_direction.append(enemy_vehicle)
+            for hexagon in hexes:
+                for enemy_vehicle in vehicle_map.get(hexagon, ()):
+                    if targets >> enemy_vehicle.owning_player.index & 1:
+                        vehicles_in_direction.append(enemy_vehicle)
             if vehicles_in_direction:
-                results.append(
-                    (one_direction_shootable_hexes[0], vehicles_in_direction)
-                )
+                results.append((entry_hex, vehicles_in_direction))
         return results
 
 
 class Spg(Vehicle):
-    def __init__(self, owning_player, spawn_position, vehicleIndex):
+    def __init__(self, owning_player, spawn_position, vehicleIndex, store=None):
         super().__init__(
-            owning_player, SPG, spawn_position, vehicleIndex, 1, 1, 1, 1, 3
+            owning_player, SPG, spawn_position, vehicleIndex, store
         )
+
+
+VEHICLE_CLASSES = {
+    SPG: Spg,
+    LIGHT_TANK: Light_Tank,
+    HEAVY_TANK: Heavy_Tank,
+    MEDIUM_TANK: Medium_Tank,
+    TANK_DESTROYER: Tank_Destroyer,
+}
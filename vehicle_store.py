@@ -0,0 +1,107 @@
+import numpy as np
+from constants import *
+
+VEHICLE_TYPE_IDS = {v_type: index for index, v_type in enumerate(VEHICLE_TYPES)}
+
+# Per type stat lookup tables, indexed by type id
+TYPE_HP = np.array([VEHICLE_TYPE_STATS[t][0] for t in VEHICLE_TYPES], dtype=np.int16)
+TYPE_SP = np.array([VEHICLE_TYPE_STATS[t][1] for t in VEHICLE_TYPES], dtype=np.int16)
+TYPE_DAMAGE = np.array(
+    [VEHICLE_TYPE_STATS[t][2] for t in VEHICLE_TYPES], dtype=np.int16
+)
+TYPE_DESTRUCTION_POINTS = np.array(
+    [VEHICLE_TYPE_STATS[t][3] for t in VEHICLE_TYPES], dtype=np.int16
+)
+TYPE_SHOOTING_RANGE = np.array(
+    [VEHICLE_TYPE_STATS[t][4] for t in VEHICLE_TYPES], dtype=np.int16
+)
+
+
+class VehicleStore:
+    """
+    Struct-of-arrays storage of vehicle state. Every vehicle owns one slot in the arrays.
+
+    Only mutable state and the spawn tile are stored per slot, static stats are read from
+    the per type tables with `type`. Copying the whole state is a copy of each array in `FIELDS`.
+    """
+
+    FIELDS = (
+        "q",
+        "r",
+        "spawn_q",
+        "spawn_r",
+        "hp",
+        "sp",
+        "capture_points",
+        "owner",
+        "type",
+        "range_bonus",
+    )
+
+    def __init__(self, capacity: int = 15):
+        self.size = 0
+        self.q = np.zeros(capacity, dtype=np.int16)
+        self.r = np.zeros(capacity, dtype=np.int16)
+        self.spawn_q = np.zeros(capacity, dtype=np.int16)
+        self.spawn_r = np.zeros(capacity, dtype=np.int16)
+        self.hp = np.zeros(capacity, dtype=np.int16)
+        self.sp = np.zeros(capacity, dtype=np.int16)
+        self.capture_points = np.zeros(capacity, dtype=np.int16)
+        self.owner = np.zeros(capacity, dtype=np.int8)
+        self.type = np.zeros(capacity, dtype=np.int8)
+        self.range_bonus = np.zeros(capacity, dtype=bool)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.q)
+
+    def add(self, owner: int, v_type: str, spawn_position: tuple[int, int]) -> int:
+        """Allocate a slot for a freshly spawned vehicle and return its index."""
+        if self.size == self.capacity:
+            self.resize(max(1, 2 * self.capacity))
+        slot = self.size
+        self.size += 1
+        type_id = VEHICLE_TYPE_IDS[v_type]
+        self.q[slot] = self.spawn_q[slot] = spawn_position[0]
+        self.r[slot] = self.spawn_r[slot] = spawn_position[1]
+        self.hp[slot] = TYPE_HP[type_id]
+        self.sp[slot] = TYPE_SP[type_id]
+        self.capture_points[slot] = 0
+        self.owner[slot] = owner
+        self.type[slot] = type_id
+        self.range_bonus[slot] = False
+        return slot
+
+    def copy_slot(self, other: "VehicleStore", other_slot: int) -> int:
+        """Allocate a slot holding the same state as `other_slot` of another store."""
+        if self.size == self.capacity:
+            self.resize(max(1, 2 * self.capacity))
+        slot = self.size
+        self.size += 1
+        for field in self.FIELDS:
+            getattr(self, field)[slot] = getattr(other, field)[other_slot]
+        return slot
+
+    def resize(self, capacity: int):
+        for field in self.FIELDS:
+            old = getattr(self, field)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, field, new)
+
+    def get_state(self) -> tuple[np.ndarray, ...]:
+        """Copy of the used part of every array, in `FIELDS` order."""
+        return tuple(getattr(self, field)[: self.size].copy() for field in self.FIELDS)
+
+    def set_state(self, state: tuple[np.ndarray, ...]):
+        """Restore arrays from `get_state`, slots must not have been added since."""
+        for field, values in zip(self.FIELDS, state):
+            getattr(self, field)[: self.size] = values
+
+    def capture_points_by_owner(self, num_players: int) -> list[int]:
+        """Sum of capture points of all vehicles for each player."""
+        return np.bincount(
+            self.owner[: self.size],
+            weights=self.capture_points[: self.size],
+            minlength=num_players,
+        ).astype(int).tolist()